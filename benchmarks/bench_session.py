@@ -0,0 +1,182 @@
+"""Benchmark the operations of an InteractiveSession on synthetic test trees.
+
+Each size is measured in a fresh interpreter, e.g.::
+
+    python benchmarks/bench_session.py --sizes 1000 10000 --output results.json
+
+The results are written as JSON, with the timings (in seconds) of each size.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from pathlib import Path
+
+
+CONFTEST = """
+import pytest
+
+@pytest.fixture(scope="module")
+def {name}():
+    return "{name}"
+"""
+
+TEST_MODULE = """
+import pytest
+
+@pytest.fixture
+def local_fixture({fixture}):
+    return {fixture}
+
+{tests}
+"""
+
+TEST_FUNCTION = """
+@pytest.mark.parametrize("param", range({params}))
+def test_{index}(local_fixture, param):
+    assert local_fixture
+"""
+
+
+def generate_project(root, num_tests, depth=3, branching=4, tests_per_module=10, params=10):
+    """Write a project with about ``num_tests`` tests to root, return the node ids of its modules.
+
+    The modules are spread over a tree of ``depth`` levels of ``branching`` directories,
+    every directory has a conftest with a fixture which the tests of its modules use.
+    """
+    root = Path(root)
+    (root / "pytest.ini").write_text("[pytest]\n")
+    num_modules = max(1, num_tests // (tests_per_module * params))
+    tests = "".join(TEST_FUNCTION.format(index=index, params=params) for index in range(tests_per_module))
+    nodeids = []
+    for module_index in range(num_modules):
+        parts = []
+        remainder = module_index
+        for _ in range(depth):
+            remainder, part = divmod(remainder, branching)
+            parts.append(f"dir{part}")
+        directory = root.joinpath(*parts)
+        if not directory.exists():
+            directory.mkdir(parents=True)
+            for level in range(1, depth + 1):
+                conftest = root.joinpath(*parts[:level], "conftest.py")
+                if not conftest.exists():
+                    conftest.write_text(CONFTEST.format(name="_".join(parts[:level])))
+        filename = f"test_module{module_index}.py"
+        (directory / filename).write_text(TEST_MODULE.format(fixture="_".join(parts), tests=tests))
+        nodeids.append("/".join(parts + [filename]))
+    return nodeids
+
+
+@contextlib.contextmanager
+def _timed(timings, name):
+    start = time.perf_counter()
+    yield
+    timings[name] = time.perf_counter() - start
+
+
+def measure(root, nodeids, switches=20):
+    """Time the operations of an InteractiveSession in the project at root."""
+    from pytest_exploratory.interactive import InteractiveSession
+
+    timings = {}
+    os.chdir(root)
+    session = InteractiveSession()
+    with _timed(timings, "start"):
+        session.start(["-p", "no:cacheprovider", "-q"])
+    with _timed(timings, "session_start"):
+        session.session_start()
+    with _timed(timings, "collect"):
+        items = session.collect("")
+    with _timed(timings, "collect_again"):
+        session.collect("")
+    step = max(1, len(items) // switches)
+    contexts = [item.nodeid for item in items[::step]][:switches]
+    with _timed(timings, "context"):
+        for nodeid in contexts:
+            session.context(nodeid)
+    timings["context"] /= len(contexts)
+    with _timed(timings, "fixturenames"):
+        session.fixturenames
+    session.context(nodeids[0])
+    num_run = len(session.collect(nodeids[0]))
+    with _timed(timings, "runtests_per_test"):
+        session.runtests([])
+    timings["runtests_per_test"] /= num_run
+    with _timed(timings, "session_stop"):
+        session.session_stop()
+    # Restarting a populated session, like after a run
+    session.session_start()
+    session.collect("")
+    session.context(nodeids[0])
+    with _timed(timings, "restart"):
+        session.restart()
+    session.session_stop()
+    session.stop()
+    return {"tests": len(items), "timings": timings}
+
+
+def run_size(size, depth, params):
+    """Generate a project of the given size and measure it, in the current interpreter."""
+    with tempfile.TemporaryDirectory(prefix="pytest-exploratory-bench-") as root:
+        nodeids = generate_project(root, size, depth=depth, params=params)
+        # The terminal reporter output would dominate the timings
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            result = measure(root, nodeids)
+    return result
+
+
+def main(args=None):
+    import pytest
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", metavar="NUM", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="number of tests of the generated projects")
+    parser.add_argument("--depth", type=int, default=3, help="depth of the directory trees")
+    parser.add_argument("--params", type=int, default=10, help="parameters of each test function")
+    parser.add_argument("--output", metavar="FILE", default=None, help="write the results to FILE (JSON)")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    arguments = parser.parse_args(args)
+
+    if arguments.single:
+        result = run_size(arguments.sizes[0], arguments.depth, arguments.params)
+        json.dump(result, sys.stdout)
+        return
+
+    results = []
+    for size in arguments.sizes:
+        # A fresh interpreter per size, the test modules of a project stay imported
+        process = subprocess.run(
+            [sys.executable, __file__, "--single", "--sizes", str(size),
+             "--depth", str(arguments.depth), "--params", str(arguments.params)],
+            stdout=subprocess.PIPE,
+            check=True,
+            universal_newlines=True,
+        )
+        result = json.loads(process.stdout)
+        result.update(size=size, depth=arguments.depth, params=arguments.params)
+        results.append(result)
+        print(f"{size} tests: " + ", ".join(f"{name} {value:.4f}s" for name, value in result["timings"].items()),
+              file=sys.stderr)
+    report = {
+        "python": platform.python_version(),
+        "pytest": pytest.__version__,
+        "results": results,
+    }
+    if arguments.output:
+        with open(arguments.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    # Run from a checkout, without installing the package
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    main()
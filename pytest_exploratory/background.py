@@ -0,0 +1,55 @@
+"""Run tests in a background thread, with cancellation."""
+
+import logging
+import threading
+from collections import Counter
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class BackgroundRun(threading.Thread):
+    """Consume the reports of a run (e.g. :meth:`.interactive.InteractiveSession.iter_runtests`) in a thread.
+
+    Cancelling stops consuming the reports, which stops the run after the current test.
+    """
+
+    def __init__(self, iter_reports):
+        super().__init__(name="pytest-exploratory-run", daemon=True)
+        self.iter_reports = iter_reports
+        self.outcomes = Counter()
+        self.error = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def run(self):
+        reports = self.iter_reports()
+        try:
+            for report in reports:
+                if report.when == "call" or report.failed or report.skipped:
+                    self.outcomes[report.outcome] += 1
+                # The reports of the current test are consumed up to its teardown
+                if self._cancel_event.is_set() and report.when == "teardown":
+                    break
+        except BaseException as error:
+            self.error = error
+            LOGGER.exception("The background run failed")
+        finally:
+            reports.close()
+
+    def cancel(self, wait=True):
+        """Stop the run after the current test, waiting for its teardown."""
+        self._cancel_event.set()
+        if wait and self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+    def status(self):
+        counts = ", ".join(f"{count} {outcome}" for outcome, count in sorted(self.outcomes.items()))
+        if self.is_alive():
+            state = "cancelling" if self.cancelled else "running"
+        else:
+            state = "cancelled" if self.cancelled else "finished"
+        return f"{state}: {counts or 'no result'}"
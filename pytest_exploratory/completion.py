@@ -0,0 +1,89 @@
+"""Completion of node ids, from collected nodes and a background scan of test files."""
+
+import os
+import bisect
+import fnmatch
+import logging
+import threading
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Separators between a node id and the node ids of its children
+_SEPARATORS = ("/", "::", "[")
+
+
+def scan_test_files(root, python_files, norecursedirs):
+    """Yield the paths (relative to root, with ``/`` separators) of the test files under root."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            dirname for dirname in dirnames
+            if not dirname.startswith(".")
+            and not any(fnmatch.fnmatch(dirname, pattern) for pattern in norecursedirs)
+        )
+        relative_dir = os.path.relpath(dirpath, root)
+        for filename in sorted(filenames):
+            if any(fnmatch.fnmatch(filename, pattern) for pattern in python_files):
+                path = filename if relative_dir == "." else os.path.join(relative_dir, filename)
+                yield path.replace(os.sep, "/")
+
+
+class NodeIdCompletions:
+    """Sorted set of known node ids, completed one level (path part, class, test, parameter) at a time."""
+
+    def __init__(self):
+        self._nodeids = []
+        self._lock = threading.Lock()
+        self._scanner = None
+
+    def add(self, nodeids):
+        """Add node ids (e.g. from a collection)."""
+        with self._lock:
+            new = set(nodeids).difference(self._nodeids)
+            if new:
+                self._nodeids = sorted(new.union(self._nodeids))
+
+    def clear(self):
+        with self._lock:
+            self._nodeids = []
+
+    def __contains__(self, nodeid):
+        nodeids = self._nodeids
+        index = bisect.bisect_left(nodeids, nodeid)
+        return index < len(nodeids) and nodeids[index] == nodeid
+
+    def scan_in_background(self, root, python_files, norecursedirs):
+        """Add the test files found under root from a background thread (only started once)."""
+        if self._scanner is not None:
+            return
+
+        def scan():
+            try:
+                self.add(scan_test_files(root, python_files, norecursedirs))
+            except OSError:
+                LOGGER.exception("Could not scan %s for test files", root)
+
+        self._scanner = threading.Thread(target=scan, name="pytest-exploratory-scan", daemon=True)
+        self._scanner.start()
+
+    def wait_scan(self, timeout=None):
+        if self._scanner is not None:
+            self._scanner.join(timeout)
+
+    def complete(self, prefix):
+        """Completions of the prefix, up to (and including) the next separator."""
+        nodeids = self._nodeids
+        start = bisect.bisect_left(nodeids, prefix)
+        completions = []
+        for nodeid in nodeids[start:]:
+            if not nodeid.startswith(prefix):
+                break
+            end = len(nodeid)
+            for separator in _SEPARATORS:
+                position = nodeid.find(separator, len(prefix))
+                if position != -1 and position + len(separator) < end:
+                    end = position + len(separator)
+            completion = nodeid[:end]
+            if not completions or completions[-1] != completion:
+                completions.append(completion)
+        return completions
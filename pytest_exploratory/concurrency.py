@@ -0,0 +1,83 @@
+"""Setup the independent fixtures of an item concurrently."""
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+def fixture_dependencies(request, fixturenames):
+    """Map each fixture name to the names it depends on (restricted to the given names)."""
+    names = set(fixturenames)
+    dependencies = {}
+    for name in fixturenames:
+        fixturedefs = request._arg2fixturedefs.get(name)
+        if not fixturedefs:
+            dependencies[name] = set()
+            continue
+        # A fixture requesting its own name uses the fixture it overrides,
+        # the whole chain is setup by the same task
+        argnames = set()
+        for fixturedef in reversed(fixturedefs):
+            argnames.update(fixturedef.argnames)
+            if name not in fixturedef.argnames:
+                break
+        dependencies[name] = {argname for argname in argnames if argname in names and argname != name}
+    return dependencies
+
+
+def setup_concurrently(request, fixturenames, max_workers):
+    """Setup the fixtures with a thread pool, as soon as the fixtures they depend on are setup.
+
+    Names without fixture definition (e.g. ``request``) are resolved in the calling thread.
+    The dependencies are finished before their dependents start,
+    so the finalizers are registered in an order which keeps the teardown correct.
+    """
+    dependencies = fixture_dependencies(request, fixturenames)
+    done = set()
+    for name in fixturenames:
+        fixturedefs = request._arg2fixturedefs.get(name)
+        if not fixturedefs:
+            request.getfixturevalue(name)
+            done.add(name)
+    pending = [name for name in fixturenames if name not in done]
+    running = {}
+    errors = []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pytest-fixture") as executor:
+        while pending or running:
+            if not errors:
+                for name in [name for name in pending if dependencies[name] <= done]:
+                    pending.remove(name)
+                    running[executor.submit(request.getfixturevalue, name)] = name
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    future.result()
+                except Exception as error:
+                    errors.append(error)
+                else:
+                    done.add(name)
+    if errors:
+        raise errors[0]
+    if pending:
+        raise ValueError(f"Could not setup fixtures with circular dependencies: {pending}")
+
+
+def concurrent_fill(request, autousenames, max_workers):
+    """Replacement of FixtureRequest._fillfixtures setting up the non autouse fixtures concurrently."""
+    def fill():
+        item = request._pyfuncitem
+        fixturenames = list(getattr(item, "fixturenames", request.fixturenames))
+        # Autouse fixtures usually prepare the environment of the others
+        for argname in autousenames:
+            if argname in fixturenames:
+                request.getfixturevalue(argname)
+        setup_concurrently(
+            request,
+            [name for name in fixturenames if name not in item.funcargs and name not in autousenames],
+            max_workers,
+        )
+        for argname in fixturenames:
+            if argname not in item.funcargs:
+                item.funcargs[argname] = request.getfixturevalue(argname)
+    return fill
@@ -0,0 +1,154 @@
+"""Persistent history of the interactive test runs."""
+
+import json
+import time
+import sqlite3
+from pathlib import Path
+import pytest
+from pytest_exploratory.reloading import file_signature, file_hash
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    session REAL NOT NULL,
+    started REAL NOT NULL,
+    args TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    run INTEGER NOT NULL REFERENCES runs(id),
+    nodeid TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    setup REAL NOT NULL DEFAULT 0,
+    call REAL NOT NULL DEFAULT 0,
+    teardown REAL NOT NULL DEFAULT 0,
+    params TEXT,
+    code_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS results_nodeid ON results(nodeid, id);
+"""
+
+# Most recent result of each test
+_LAST_RESULTS = """
+SELECT nodeid, outcome, setup + call + teardown AS duration, id FROM results AS result
+WHERE id = (SELECT MAX(id) FROM results WHERE nodeid = result.nodeid)
+"""
+
+
+def history_path(config):
+    """Path of the history database in the pytest cache, None if the cache plugin is disabled."""
+    cache = getattr(config, "cache", None)
+    if cache is None:
+        return None
+    return Path(str(cache.makedir("exploratory"))) / "history.sqlite"
+
+
+class RunHistory:
+    """Plugin appending the results of the interactive runs to a SQLite database.
+
+    Each result has the node id, outcome, the durations of each phase, the parameters
+    and the hash of the test module. Without path, the history only lasts for the session.
+    """
+
+    def __init__(self, path=None):
+        # The runs can come from the watcher thread, they are serialized by the interactive session
+        self._connection = sqlite3.connect(str(path) if path else ":memory:", check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+        self._session = time.time()
+        self._run = None
+        self._pending = {}
+        self._items = {}
+        self._hashes = {}
+
+    def close(self):
+        self._connection.close()
+
+    def start_run(self, args):
+        """Start recording a run, the results before the next run are part of it."""
+        with self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO runs (session, started, args) VALUES (?, ?, ?)",
+                (self._session, time.time(), json.dumps(list(args))),
+            )
+        self._run = cursor.lastrowid
+
+    def _code_hash(self, item):
+        path = Path(str(item.fspath))
+        try:
+            signature = file_signature(path)
+            if self._hashes.get(path, (None,))[0] != signature:
+                self._hashes[path] = signature, file_hash(path)
+        except OSError:
+            return None
+        return self._hashes[path][1]
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        callspec = getattr(item, "callspec", None)
+        params = None
+        if callspec is not None:
+            params = json.dumps({name: repr(value) for name, value in callspec.params.items()})
+        self._items[item.nodeid] = params, self._code_hash(item)
+
+    def pytest_runtest_logreport(self, report):
+        if self._run is None:
+            return
+        result = self._pending.setdefault(report.nodeid, {"outcome": "passed"})
+        result[report.when] = report.duration
+        if report.failed:
+            result["outcome"] = "failed" if report.when == "call" else "error"
+        elif report.skipped and result["outcome"] == "passed":
+            result["outcome"] = "skipped"
+        if report.when == "teardown":
+            self._record(report.nodeid, self._pending.pop(report.nodeid))
+
+    def _record(self, nodeid, result):
+        params, code_hash = self._items.pop(nodeid, (None, None))
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO results (run, nodeid, outcome, setup, call, teardown, params, code_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._run, nodeid, result["outcome"], result.get("setup", 0.0), result.get("call", 0.0),
+                 result.get("teardown", 0.0), params, code_hash),
+            )
+
+    def slowest(self, limit=10):
+        """``(nodeid, outcome, duration)`` of the slowest tests, on their last run."""
+        return self._connection.execute(
+            f"SELECT nodeid, outcome, duration FROM ({_LAST_RESULTS}) ORDER BY duration DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+
+    def slower(self, threshold=0.2, minimum=0.001, limit=10):
+        """``(nodeid, previous, last)`` durations of the tests which got slower since their previous run.
+
+        Only the tests more than ``threshold`` (relative) and ``minimum`` seconds slower are returned,
+        the most slowed down first.
+        """
+        return self._connection.execute(
+            f"""
+            SELECT * FROM (
+                SELECT last.nodeid, (
+                    SELECT setup + call + teardown FROM results
+                    WHERE nodeid = last.nodeid AND id < last.id ORDER BY id DESC LIMIT 1
+                ) AS previous, last.duration
+                FROM ({_LAST_RESULTS}) AS last
+            )
+            WHERE duration > previous * (1 + ?) AND duration - previous > ?
+            ORDER BY duration / MAX(previous, 1e-9) DESC LIMIT ?
+            """,
+            (threshold, minimum, limit),
+        ).fetchall()
+
+    def trend(self, nodeid, limit=20):
+        """``(started, session, outcome, setup, call, teardown, code_hash)`` of the last runs of a test."""
+        rows = self._connection.execute(
+            """
+            SELECT runs.started, runs.session, outcome, setup, call, teardown, code_hash
+            FROM results JOIN runs ON results.run = runs.id
+            WHERE nodeid = ? ORDER BY results.id DESC LIMIT ?
+            """,
+            (nodeid, limit),
+        ).fetchall()
+        return rows[::-1]
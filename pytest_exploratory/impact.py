@@ -0,0 +1,169 @@
+"""Record the lines covered by each test, to select the tests affected by an edit."""
+
+import sys
+import difflib
+import hashlib
+from pathlib import Path
+import pytest
+
+
+# Tool ids which are not reserved for debuggers, coverage or profilers
+_MONITORING_TOOL_IDS = (3, 4)
+
+
+def _read_lines(filename):
+    try:
+        content = Path(filename).read_bytes()
+    except OSError:
+        return None, None
+    return hashlib.sha1(content).hexdigest(), content.decode("utf-8", "replace").splitlines()
+
+
+def _changed_lines(old, new):
+    """Line numbers (1-based) of old which were modified, deleted or next to an insertion."""
+    changed = set()
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    for tag, i1, i2, _, _ in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        if i1 == i2:
+            changed.update((i1, i1 + 1))
+        else:
+            changed.update(range(i1 + 1, i2 + 1))
+    return changed
+
+
+class _LineTracer:
+    """Collect the executed lines of local files.
+
+    Uses ``sys.monitoring`` when available (Python >= 3.12), ``sys.settrace`` otherwise.
+    """
+
+    def __init__(self, is_local):
+        self.is_local = is_local
+        self.lines = set()
+        self._tool_id = None
+        self._previous_trace = None
+
+    def _monitoring_line(self, code, line):
+        if self.is_local(code.co_filename):
+            self.lines.add((code.co_filename, line))
+        # Each line only needs to be seen once per test
+        return sys.monitoring.DISABLE
+
+    def _global_trace(self, frame, event, arg):
+        if not self.is_local(frame.f_code.co_filename):
+            return None
+        return self._local_trace
+
+    def _local_trace(self, frame, event, arg):
+        if event == "line":
+            self.lines.add((frame.f_code.co_filename, frame.f_lineno))
+        return self._local_trace
+
+    def start(self):
+        self.lines = set()
+        monitoring = getattr(sys, "monitoring", None)
+        if monitoring is not None:
+            for tool_id in _MONITORING_TOOL_IDS:
+                try:
+                    monitoring.use_tool_id(tool_id, "pytest-exploratory")
+                except ValueError:
+                    continue
+                self._tool_id = tool_id
+                monitoring.register_callback(tool_id, monitoring.events.LINE, self._monitoring_line)
+                monitoring.set_events(tool_id, monitoring.events.LINE)
+                monitoring.restart_events()
+                return
+        self._previous_trace = sys.gettrace()
+        sys.settrace(self._global_trace)
+
+    def stop(self):
+        if self._tool_id is not None:
+            monitoring = sys.monitoring
+            monitoring.set_events(self._tool_id, 0)
+            monitoring.register_callback(self._tool_id, monitoring.events.LINE, None)
+            monitoring.free_tool_id(self._tool_id)
+            self._tool_id = None
+        else:
+            sys.settrace(self._previous_trace)
+            self._previous_trace = None
+        return self.lines
+
+
+class ImpactMap:
+    """Plugin recording the lines covered by each test run.
+
+    The covered lines are kept with the version (content hash) of their file at the time of the run,
+    so that the lines changed since then can be computed from a diff.
+    """
+
+    def __init__(self, roots=()):
+        self.roots = [Path(root).resolve() for root in roots]
+        self._local = {}
+        self._sources = {}
+        self._coverage = {}
+
+    def _is_local(self, filename):
+        try:
+            return self._local[filename]
+        except KeyError:
+            pass
+        path = Path(filename)
+        is_local = (
+            path.is_absolute()
+            and "site-packages" not in path.parts
+            and any(root in path.parents for root in self.roots)
+        )
+        self._local[filename] = is_local
+        return is_local
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        tracer = _LineTracer(self._is_local)
+        tracer.start()
+        try:
+            yield
+        finally:
+            lines = tracer.stop()
+        self.record(item.nodeid, lines)
+
+    def record(self, nodeid, lines):
+        """Record the ``(filename, line)`` covered by the given test."""
+        by_file = {}
+        for filename, line in lines:
+            by_file.setdefault(filename, set()).add(line)
+        coverage = {}
+        for filename, file_lines in by_file.items():
+            version, source = _read_lines(filename)
+            if version is None:
+                continue
+            self._sources[(filename, version)] = source
+            coverage[filename] = version, frozenset(file_lines)
+        self._coverage[nodeid] = coverage
+
+    def is_affected(self, nodeid):
+        """Whether the test was never recorded, or covered lines changed since it was recorded."""
+        return self._is_affected(nodeid, {})
+
+    def _is_affected(self, nodeid, changes):
+        if nodeid not in self._coverage:
+            return True
+        for filename, (version, lines) in self._coverage[nodeid].items():
+            key = (filename, version)
+            if key not in changes:
+                current_version, current = _read_lines(filename)
+                if current_version is None:
+                    changes[key] = None
+                elif current_version == version:
+                    changes[key] = set()
+                else:
+                    changes[key] = _changed_lines(self._sources[key], current)
+            if changes[key] is None or changes[key] & lines:
+                return True
+        return False
+
+    def affected(self, items):
+        """Filter the items affected by the changes since they were last run."""
+        changes = {}
+        return [item for item in items if self._is_affected(item.nodeid, changes)]
@@ -4,19 +4,37 @@ import sys
 import inspect
 import logging
 from pathlib import Path
-import tempfile
-from importlib import reload
+import copy
+import types
 import re
+import bisect
 import warnings
+import py
 import pytest
 import argparse
 import shlex
+import threading
+import timeit
+from collections import namedtuple
 from contextlib import contextmanager
 from _pytest.config import _prepareconfig
 from _pytest.main import Session
 from _pytest.python import CallSpec2, Metafunc, FunctionDefinition
 from _pytest.mark import ParameterSet
+from _pytest.compat import get_real_func
 import _pytest.debugging
+import _pytest.runner
+from pytest_exploratory.workers import WorkerPool, ForkServer
+from pytest_exploratory.reloading import ModuleReloader, file_signature, file_hash
+from pytest_exploratory.watch import FileWatcher
+from pytest_exploratory.impact import ImpactMap
+from pytest_exploratory.concurrency import concurrent_fill
+from pytest_exploratory.completion import NodeIdCompletions
+from pytest_exploratory.history import RunHistory, history_path
+from pytest_exploratory.background import BackgroundRun
+from pytest_exploratory.profiling import (
+    PhaseProfiler, SamplingProfiler, FixtureTimer, DurationRecorder, TimingResult,
+)
 
 
 LOGGER = logging.getLogger(__name__)
@@ -45,12 +63,104 @@ def request_teardown(request, fixturename):
         pass
 
 
-def _is_child(item, nodeid):
-    while item is not None:
-        if item.nodeid == nodeid:
-            return True
-        item = item.parent
-    return False
+def _forget_request(item):
+    """Drop the fixture request of an item which is not setup anymore, like pytest does after a run.
+
+    The collected items are reused, pytest only creates a new request for an item without one.
+    """
+    if hasattr(item, "_initrequest"):
+        item._request = False
+        item.funcargs = None
+
+
+class _NodeIndex:
+    """Sorted index of the collected items by node id, for prefix lookups."""
+
+    # Separators between a node id and the node id of its children
+    _SEPARATORS = ("/", "::")
+
+    def __init__(self, items=()):
+        self.update(items)
+
+    def update(self, items):
+        """Rebuild the index from the collected items."""
+        self._items = list(items)
+        self._keys = sorted((item.nodeid, i) for i, item in enumerate(self._items))
+
+    def _range(self, prefix):
+        if prefix == "":
+            return self._keys
+        start = bisect.bisect_left(self._keys, (prefix,))
+        # Smallest string greater than all the strings starting with prefix
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        end = bisect.bisect_left(self._keys, (upper,), lo=start)
+        return self._keys[start:end]
+
+    def first(self, prefix):
+        """Return the first collected item whose node id starts with prefix, or None."""
+        matches = self._range(prefix)
+        if not matches:
+            return None
+        return self._items[min(i for _, i in matches)]
+
+    def children(self, nodeid):
+        """Return the collected items under the given node id, in collection order."""
+        indexes = [
+            i for key, i in self._range(nodeid)
+            if key == nodeid or key[len(nodeid):].startswith(self._SEPARATORS)
+        ]
+        return [self._items[i] for i in sorted(indexes)]
+
+
+class _FixtureNameIndex:
+    """Fixture names in definition order, with the parameter ids of parametrized fixtures.
+
+    The ids are computed on demand and cached per fixture definition,
+    so they are only recomputed when a fixture gets a new definition.
+    """
+
+    def __init__(self):
+        self._definitions = {}
+        self._ids = {}
+
+    def update(self, arg2fixturedefs):
+        """Pick up the fixture definitions registered since the last update."""
+        for name, fixturedefs in arg2fixturedefs.items():
+            if not fixturedefs:
+                continue
+            fixturedef = fixturedefs[-1]
+            old = self._definitions.get(name)
+            if old is not fixturedef:
+                self._definitions[name] = fixturedef
+                self._ids.pop(old, None)
+
+    def names(self):
+        return list(self._definitions)
+
+    def ids(self, name, compute_ids):
+        """Parameter ids of the fixture, computed with compute_ids(name) on first use."""
+        fixturedef = self._definitions[name]
+        if not fixturedef.params:
+            return []
+        if fixturedef not in self._ids:
+            try:
+                self._ids[fixturedef] = list(compute_ids(name))
+            except Exception:
+                LOGGER.debug("Could not compute the parameter ids of %s", name, exc_info=True)
+                return []
+        return self._ids[fixturedef]
+
+
+class _VirtualModule(pytest.Module):
+    """In-memory test module at the root, for the default (session) context."""
+
+    filename = "__interactive__.py"
+
+    def _getobj(self):
+        module = types.ModuleType(self.filename[:-len(".py")])
+        module.__file__ = str(self.fspath)
+        return module
+
 
 class _FilterCollection:
     def __init__(self, root, path=""):
@@ -67,6 +177,106 @@ class _FilterCollection:
         return True
 
 
+class _ReportBuffer:
+    """Plugin keeping the test reports until they are popped."""
+
+    def __init__(self):
+        self._reports = []
+
+    def pytest_runtest_logreport(self, report):
+        self._reports.append(report)
+
+    def pop(self):
+        reports, self._reports = self._reports, []
+        return reports
+
+
+class _Outcomes:
+    """Plugin tracking the failed tests for ``--lf``, ``--ff`` and ``--sw``, like pytest's cache plugin."""
+
+    def __init__(self):
+        self.lastfailed = {}
+        self.stepwise = None
+        self.failures = 0
+        self.last_failure = None
+
+    def load(self, config):
+        cache = getattr(config, "cache", None)
+        if cache is not None:
+            self.lastfailed = dict(cache.get("cache/lastfailed", {}))
+            self.stepwise = cache.get("cache/stepwise", None) or None
+
+    def save(self, config):
+        cache = getattr(config, "cache", None)
+        if cache is not None:
+            cache.set("cache/lastfailed", self.lastfailed)
+            cache.set("cache/stepwise", self.stepwise)
+
+    def pytest_runtest_logreport(self, report):
+        passed = report.outcome in ("passed", "skipped")
+        if (report.when == "call" and passed) or report.skipped:
+            self.lastfailed.pop(report.nodeid, None)
+        elif report.failed:
+            self.lastfailed[report.nodeid] = True
+            self.failures += 1
+            self.last_failure = report.nodeid
+
+
+class _CollectionCache:
+    """Reuse the collected nodes of test files which did not change.
+
+    Collection reports are kept by node id for every collector inside a test module,
+    and dropped when the file signature (mtime/size, then content hash) changes.
+    """
+
+    def __init__(self):
+        self._files = {}
+        self._reports = {}
+
+    def _is_fresh(self, path):
+        try:
+            signature = file_signature(path)
+        except OSError:
+            return False
+        try:
+            cached_signature, cached_hash = self._files[path]
+        except KeyError:
+            self._files[path] = signature, file_hash(path)
+            return False
+        if signature == cached_signature:
+            return True
+        # The file was touched, only invalidate if the content really changed
+        content_hash = file_hash(path)
+        self._files[path] = signature, content_hash
+        if content_hash == cached_hash:
+            return True
+        self.invalidate(path)
+        return False
+
+    def invalidate(self, path=None):
+        """Forget the collected nodes of the given file (or all of them)."""
+        if path is None:
+            self._files.clear()
+            self._reports.clear()
+            return
+        self._files.pop(path, None)
+        for key in [key for key in self._reports if key[0] == path]:
+            del self._reports[key]
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_make_collect_report(self, collector):
+        if isinstance(collector, pytest.Package) or collector.getparent(pytest.Module) is None:
+            return None
+        path = Path(str(collector.fspath))
+        key = (path, collector.nodeid, type(collector))
+        if self._is_fresh(path) and key in self._reports:
+            return self._reports[key]
+        report = _pytest.runner.pytest_make_collect_report(collector)
+        if report.passed:
+            self._reports[key] = report
+        return report
+
+
 def _reload_items(items):
     for item in items:
         try:
@@ -88,6 +298,267 @@ def _reload_items(items):
         setattr(obj_self.__class__, obj.__name__, getattr(cls, obj.__name__))
 
 
+ContextSwitch = namedtuple("ContextSwitch", ["scope", "reused", "rebuilt", "torn_down"])
+ContextSwitch.__doc__ = """Fixtures kept, setup and torn down when switching context.
+
+``scope`` is the scope of the deepest node shared by both contexts, kept alive during the switch.
+"""
+
+# A named context put aside: its item is off the setup stack, with its finalizers,
+# and the state of its function-scoped fixtures
+_ParkedContext = namedtuple(
+    "_ParkedContext",
+    ["node", "item", "request", "funcargs", "finalizers", "fixtures", "finish", "registered"],
+)
+
+# Names of the contexts switched to and from by timeit, they are not strings like the user names
+_TIMED_CONTEXT = object()
+_PREVIOUS_CONTEXT = object()
+
+
+def _fixture_values(request):
+    """Values of the fixtures setup for the request, by name."""
+    values = {}
+    self_value = getattr(request.node.obj, "__self__", None)
+    if self_value is not None:
+        values["self"] = self_value
+    for argname, fixturedef in request._fixture_defs.items():
+        cached_result = getattr(fixturedef, "cached_result", None)
+        # (value, cache key, exception info)
+        if cached_result is not None and cached_result[2] is None:
+            values[argname] = cached_result[0]
+    return values
+
+
+def _remove_finalizer(finalizer, registered):
+    for finalizers in registered:
+        if finalizer in finalizers:
+            finalizers.remove(finalizer)
+
+
+def _node_scope(node):
+    if isinstance(node, Session):
+        return "session"
+    if isinstance(node, pytest.Package):
+        return "package"
+    if isinstance(node, pytest.Module):
+        return "module"
+    # TODO remove Instance with pytest >= 7
+    if isinstance(node, (pytest.Class, getattr(pytest, "Instance", pytest.Class))):
+        return "class"
+    return "function"
+
+
+def _common_scope(item, nextitem):
+    common = None
+    for node, next_node in zip(item.listchain(), nextitem.listchain()):
+        if node is not next_node:
+            break
+        common = node
+    if common is None:
+        return None
+    return _node_scope(common)
+
+
+def _swap_function_fixtures(session, fixtures):
+    """Replace the state of the function-scoped fixtures by the given one, return the previous state."""
+    previous = {}
+    for fixturedef, cached_result in _active_fixtures(session).items():
+        if fixturedef.scope == "function":
+            previous[fixturedef] = cached_result, fixturedef._finalizers
+            fixturedef.cached_result = None
+            fixturedef._finalizers = []
+    for fixturedef, (cached_result, finalizers) in fixtures.items():
+        fixturedef.cached_result = cached_result
+        fixturedef._finalizers = finalizers
+    return previous
+
+
+def _active_fixtures(session):
+    return {
+        fixturedef: fixturedef.cached_result
+        for fixturedefs in session._fixturemanager._arg2fixturedefs.values()
+        for fixturedef in fixturedefs
+        if getattr(fixturedef, "cached_result", None) is not None
+    }
+
+
+class LazyFixture:
+    """Proxy to a fixture value, only setup when the proxy is first used.
+
+    Once bound to a namespace, the proxy replaces itself with the fixture value in it.
+    """
+
+    __slots__ = ("_session", "_name", "_namespace")
+
+    def __init__(self, session, name):
+        object.__setattr__(self, "_session", session)
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_namespace", None)
+
+    def _bind(self, namespace):
+        object.__setattr__(self, "_namespace", namespace)
+
+    def _value(self):
+        value = self._session.fixture(self._name)
+        if self._namespace is not None and self._namespace.get(self._name) is self:
+            self._namespace[self._name] = value
+        return value
+
+    def __getattr__(self, name):
+        return getattr(self._value(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._value(), name, value)
+
+    def __repr__(self):
+        return repr(self._value())
+
+
+def _forward_to_fixture(name):
+    def method(self, *args, **kwargs):
+        return getattr(self._value(), name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+for _name in (
+    "__str__", "__bool__", "__len__", "__iter__", "__contains__",
+    "__getitem__", "__setitem__", "__delitem__", "__call__", "__enter__", "__exit__",
+    "__eq__", "__ne__", "__lt__", "__le__", "__gt__", "__ge__", "__hash__",
+    "__int__", "__float__", "__index__", "__add__", "__sub__", "__mul__", "__truediv__",
+):
+    setattr(LazyFixture, _name, _forward_to_fixture(_name))
+
+
+def _fill_autouse_fixtures(request, autousenames):
+    # Replaces FixtureRequest._fillfixtures which sets up all the fixtures of the item
+    def fill():
+        for argname in autousenames:
+            if argname in request.fixturenames:
+                request.getfixturevalue(argname)
+    return fill
+
+
+def _copy_callspec(callspec):
+    # The parameters of the context can be changed (see fixture_param)
+    copied = copy.copy(callspec)
+    for attribute in ("params", "indices", "funcargs"):
+        if isinstance(getattr(callspec, attribute, None), dict):
+            object.__setattr__(copied, attribute, dict(getattr(callspec, attribute)))
+    return copied
+
+
+def _chain_nodeids(items):
+    seen = set()
+    for item in items:
+        node = item
+        while node is not None and node not in seen:
+            seen.add(node)
+            if node.nodeid:
+                yield node.nodeid
+            node = node.parent
+
+
+def _module_object(item):
+    module = item.getparent(pytest.Module)
+    if module is None:
+        return None
+    return module.obj
+
+
+def _reload_fixtures(fixturemanager, module):
+    # Matched on the file, the conftests outside of packages all have the same module name
+    path = Path(module.__file__).resolve()
+    same_file = {}
+    for fixturedefs in fixturemanager._arg2fixturedefs.values():
+        for fixturedef in fixturedefs:
+            func = fixturedef.func
+            code = getattr(func, "__code__", None)
+            if code is None:
+                continue
+            if code.co_filename not in same_file:
+                same_file[code.co_filename] = Path(code.co_filename).resolve() == path
+            if not same_file[code.co_filename]:
+                continue
+            # TODO reload fixtures defined in classes
+            if getattr(func, "__qualname__", "") != func.__name__:
+                continue
+            new_func = getattr(module, func.__name__, None)
+            if new_func is not None:
+                fixturedef.func = get_real_func(new_func)
+
+
+def _parse_runtests_args(args):
+    """Parse the arguments of :meth:`InteractiveSession.runtests`, exiting on invalid arguments."""
+    parser = argparse.ArgumentParser(
+        prog='pytest_runtests',
+        description='Run tests under the current context'
+    )
+    parser.add_argument('tests',
+                        nargs='*',
+                        metavar="TEST",
+                        default=tuple(),
+                        help='Test names to run, relative to the current context')
+    parser.add_argument('-k',
+                        metavar="EXPRESSION",
+                        default=None,
+                        help='only run tests which match the given substring expression')
+    parser.add_argument('-m',
+                        metavar="MARKEXPR",
+                        default=None,
+                        help='only run tests matching given mark expression')
+    parser.add_argument('-n',
+                        metavar="NUM",
+                        type=int,
+                        default=None,
+                        help='distribute the tests over NUM persistent worker processes')
+    parser.add_argument('--fork',
+                        action='store_true',
+                        help='run the tests in a fresh fork of a warm template process')
+    parser.add_argument('--changed',
+                        action='store_true',
+                        help='only run the tests depending on code changed since the last run')
+    parser.add_argument('--affected',
+                        action='store_true',
+                        help='only run the tests which covered lines changed since they last ran '
+                             '(coverage is recorded from the first use)')
+    parser.add_argument('--setup-workers',
+                        metavar="NUM",
+                        type=int,
+                        default=None,
+                        help='setup the independent fixtures of each test concurrently in NUM threads')
+    parser.add_argument('--lf', '--last-failed',
+                        dest='last_failed',
+                        action='store_true',
+                        help='only run the tests which failed last time (all if none failed)')
+    parser.add_argument('--ff', '--failed-first',
+                        dest='failed_first',
+                        action='store_true',
+                        help='run the tests which failed last time first')
+    parser.add_argument('--sw', '--stepwise',
+                        dest='stepwise',
+                        action='store_true',
+                        help='start from the test which failed last time and stop at the first failure')
+    parser.add_argument('--repeat',
+                        metavar="NUM",
+                        type=int,
+                        default=None,
+                        help='run the tests NUM times, keeping the higher-scoped fixtures between runs')
+    parser.add_argument('--until-fail',
+                        action='store_true',
+                        help='run the tests repeatedly until one fails (at most --repeat times)')
+    arguments = parser.parse_args(args)
+    if arguments.fork and arguments.n is not None:
+        parser.error("-n and --fork cannot be combined")
+    repeated = arguments.repeat is not None or arguments.until_fail
+    if repeated and (arguments.fork or arguments.n is not None):
+        parser.error("--repeat and --until-fail cannot be combined with -n or --fork")
+    if arguments.stepwise and (arguments.fork or arguments.n is not None):
+        parser.error("--sw cannot be combined with -n or --fork")
+    return arguments
+
+
 class InteractiveSession:
     """Wrapper around pytest to collect and run tests interactively.
 
@@ -101,15 +572,38 @@ class InteractiveSession:
         self.session = None
         self.context_node = None
         self.context_item = None
+        self.context_name = None
+        self._contexts = {}
+        self._virtual = None
+        self._dummy_items = {}
         self._request = None
-        self._mtime = None
-        self._fixturenames = None
+        self._reloader = None
+        self._fixture_index = _FixtureNameIndex()
+        self._collection_cache = _CollectionCache()
+        self._outcomes = _Outcomes()
+        self._index = _NodeIndex()
+        self._completions = NodeIdCompletions()
+        self._workers = None
+        self._forkserver = None
+        self._watcher = None
+        self._background = None
+        self._background_fixtures = {}
+        self._impact = None
+        self.fixture_timer = FixtureTimer()
+        self.last_durations = None
+        self.history = None
+        self._baselines = {}
+        self.last_switch = None
+        # Held while running or changing context, e.g. to run tests from the watcher thread
+        self._lock = threading.RLock()
 
     def _teardown_if_needed(self, item, nextitem):
         try:
             self.session._setupstate.teardown_exact(item, nextitem)
         except AssertionError:
             pass
+        if item is not None and item not in self.session._setupstate.stack:
+            _forget_request(item)
 
     def start(self, args=None):
         """Initialize the pytest config from the given arguments."""
@@ -124,6 +618,9 @@ class InteractiveSession:
         self._config_override()
         self._filter = _FilterCollection(str(self.config.rootdir))
         self.config.pluginmanager.register(self._filter, "interactive_filter")
+        self.config.pluginmanager.register(self._collection_cache, "interactive_collection_cache")
+        self.config.pluginmanager.register(self.fixture_timer, "interactive_fixture_timer")
+        self.config.pluginmanager.register(self._outcomes, "interactive_outcomes")
 
     def _config_override(self):
         # Overriding some options which don't make sense in interactive use
@@ -139,12 +636,33 @@ class InteractiveSession:
         """Start a pytest session."""
         if self.config is None:
             self.start()
-        self.config._do_configure()
+        if not self.config._configured:
+            # Still configured when restarting
+            self.config._do_configure()
+        self._outcomes.load(self.config)
+        # Cached nodes belong to the previous session
+        self._collection_cache.invalidate()
+        self._index.update(())
+        self._dummy_items.clear()
+        self._contexts.clear()
+        self.context_name = None
+        self.context_node = None
+        self.context_item = None
+        self._request = None
+        self.last_switch = None
+        self._reloader = ModuleReloader([self.config.rootdir])
+        # The previous session and its fixture manager stay registered when restarting
+        for name in ("session", "funcmanage"):
+            plugin = self.config.pluginmanager.get_plugin(name)
+            if plugin is not None:
+                self.config.pluginmanager.unregister(plugin)
         if hasattr(Session, "from_config"):
             self.session = Session.from_config(self.config)
         else:  # TODO remove with pytest >= 5.4
             self.session = Session(self.config)
         self.config.hook.pytest_sessionstart(session=self.session)
+        self.history = RunHistory(history_path(self.config))
+        self.config.pluginmanager.register(self.history, "interactive_history")
         # TODO remove this when it's fixed in IPython
         warnings.filterwarnings('ignore', module=r'^jedi\.cache')
 
@@ -155,6 +673,15 @@ class InteractiveSession:
         nodeid = path
         if "::" in nodeid:
             path = nodeid.split("::", 1)[0]
+        self._run_collection(path)
+        self._index.update(self.session.items)
+        self._track_modules(self.session.items)
+        self._completions.add(_chain_nodeids(self.session.items))
+        if nodeid != path:
+            return self._index.children(nodeid)
+        return list(self.session.items)
+
+    def _run_collection(self, path):
         self._filter.path = path
         # Pytest discovers tests outside of the root through arguments
         try:
@@ -169,13 +696,53 @@ class InteractiveSession:
         finally:
             if not is_in_root:
                 self.config.args.pop()
-        # TODO filter this in plugin?
-        items = list(self.session.items)
-        if nodeid != path:
-            items = [item for item in items if _is_child(item, nodeid)]
-        return items
+
+    def _collect_completions(self, path):
+        # Completing must not print in the middle of the prompt, nor replace the items of the session
+        items, testscollected = getattr(self.session, "items", []), self.session.testscollected
+        filter_path, verbose = self._filter.path, self.config.option.verbose
+        self.config.option.verbose = -2
+        try:
+            self._run_collection(path)
+            self._completions.add(_chain_nodeids(self.session.items))
+        finally:
+            self.config.option.verbose = verbose
+            self._filter.path = filter_path
+            self.session.items, self.session.testscollected = items, testscollected
+
+    def _track_modules(self, items):
+        # Most items share their parent, and the modules are already tracked on repeated collections
+        modules = {parent.getparent(pytest.Module) for parent in {item.parent for item in items}}
+        modules.discard(None)
+        modules = [module for module in modules if not self._reloader.is_tracked(module.obj)]
+        if not modules:
+            return
+        conftest_dirs = [
+            (Path(conftest.__file__).parent, conftest)
+            for conftest in self.config.pluginmanager._conftest_plugins
+            if getattr(conftest, "__file__", None)
+        ]
+        # The applicable conftests of each directory
+        applicable = {}
+        for module in modules:
+            directory = Path(str(module.fspath)).parent
+            if directory not in applicable:
+                applicable[directory] = [
+                    conftest for conftest_dir, conftest in conftest_dirs
+                    if conftest_dir == directory or conftest_dir in directory.parents
+                ]
+            self._reloader.track(module.obj, extra_dependencies=applicable[directory])
 
     def _dummy_item(self, item, context_param=""):
+        key = (item, context_param)
+        if key not in self._dummy_items:
+            func = self._make_dummy_item(item, context_param)
+            self._dummy_items[key] = func, func.callspec
+        func, callspec = self._dummy_items[key]
+        func.callspec = _copy_callspec(callspec)
+        return func
+
+    def _make_dummy_item(self, item, context_param):
         # TODO support class methods
         def dummy(request):
             pass
@@ -244,24 +811,135 @@ class InteractiveSession:
             )
         return func
 
-    def _dummy_context(self):
-        # HACK it would make more sense to create a dummy node
-        with tempfile.TemporaryDirectory() as tmp:
-            path = Path(tmp) / 'test_dummy.py'
-            path.write_text("""
-def test_exists():
-    pass
-""")
-            return self.context(str(path))
-
-    def context(self, context=""):
-        """Put ourselves in the given context (for fixture and conftest discovery)."""
-        self._fixturenames = None
+    def _virtual_module(self):
+        if self._virtual is None or self._virtual.session is not self.session:
+            fspath = py.path.local(str(self.config.rootdir)).join(_VirtualModule.filename)
+            if hasattr(_VirtualModule, "from_parent"):
+                self._virtual = _VirtualModule.from_parent(self.session, fspath=fspath)
+            else:  # TODO remove with pytest >= 5.4
+                self._virtual = _VirtualModule(fspath, parent=self.session)
+        return self._virtual
+
+    def context(self, context="", lazy=False, setup_workers=None, name=None):
+        """Put ourselves in the given context (for fixture and conftest discovery).
+
+        Return the fixtures of the context by name. If ``lazy`` is true,
+        only autouse fixtures are setup and the others are returned as :class:`LazyFixture` proxies.
+        With ``setup_workers``, independent fixtures are setup concurrently in that many threads.
+
+        A context with a ``name`` stays active when switching to another context:
+        its function-scoped fixtures are put aside, the higher-scoped ones are shared.
+        ``context(name=name)`` switches back to it without setting anything up.
+        It is torn down with the nodes it depends on, e.g. its module when switching to another module.
+        Contexts needing different parameters of a higher-scoped fixture cannot be active together.
+        """
+        with self._lock:
+            if name is not None and not context and (name in self._contexts or name == self.context_name):
+                return self._restore_context(name)
+            if name is not None and name in self._contexts:
+                self._contexts[name].finish()
+                self._contexts.pop(name, None)
+            if self.context_name is not None and self.context_name != name:
+                self._park_context()
+            fixtures = self._context(context, lazy, setup_workers)
+            self.context_name = name
+            return fixtures
+
+    @property
+    def contexts(self):
+        """Names of the named contexts, including the current one."""
+        names = set(self._contexts)
+        if self.context_name is not None:
+            names.add(self.context_name)
+        return sorted(names)
+
+    def _park_context(self):
+        item = self.context_item
+        setupstate = self.session._setupstate
+        name = self.context_name
+        self.context_name = None
+        if not setupstate.stack or setupstate.stack[-1] is not item:
+            # Already torn down (e.g. by a run), it will be setup again
+            self._contexts[name] = _ParkedContext(
+                self.context_node, item, None, None, None, None, lambda: None, [],
+            )
+            return
+        setupstate.stack.pop()
+        finalizers = setupstate._finalizers.pop(item, [])
+        fixtures = _swap_function_fixtures(self.session, {})
+        # Torn down before its parent node and the higher-scoped fixtures it uses,
+        # like a dependent fixture
+        registered = [setupstate._finalizers.setdefault(setupstate.stack[-1], [])]
+        registered.extend(
+            fixturedef._finalizers for fixturedef in item._request._fixture_defs.values()
+            if fixturedef.scope != "function" and getattr(fixturedef, "cached_result", None) is not None
+        )
+
+        def finish():
+            if name not in self._contexts or self._contexts[name].finish is not finish:
+                return
+            del self._contexts[name]
+            _remove_finalizer(finish, registered)
+            # Torn down like any item, its fixtures in place of the current ones
+            current = _swap_function_fixtures(self.session, fixtures)
+            try:
+                while finalizers:
+                    finalizers.pop()()
+                item.teardown()
+            finally:
+                _swap_function_fixtures(self.session, current)
+
+        for functions in registered:
+            functions.append(finish)
+        self._contexts[name] = _ParkedContext(
+            self.context_node, item, item._request, item.funcargs, finalizers, fixtures, finish, registered,
+        )
+        # A run of the test while parked must setup its own fixtures, restoring puts them back
+        _forget_request(item)
+
+    def _restore_context(self, name):
+        if name != self.context_name:
+            previous = self.context_item
+            parked = self._contexts.pop(name)
+            if self.context_name is not None:
+                self._park_context()
+            if parked.request is None:
+                self.context_node = parked.node
+                fixtures = self._enter_context(parked.item, False, None)
+                self.context_name = name
+                return fixtures
+            setupstate = self.session._setupstate
+            self._teardown_if_needed(previous, parked.item)
+            _remove_finalizer(parked.finish, parked.registered)
+            setupstate.stack.append(parked.item)
+            setupstate._finalizers[parked.item] = parked.finalizers
+            _swap_function_fixtures(self.session, parked.fixtures)
+            parked.item._request = parked.request
+            parked.item.funcargs = parked.funcargs
+            self.context_node = parked.node
+            self.context_item = parked.item
+            self._request = parked.request
+            self.context_name = name
+            self.last_switch = ContextSwitch(
+                scope=_common_scope(previous, parked.item) if previous is not None else None,
+                reused=sorted(fixturedef.argname for fixturedef in _active_fixtures(self.session)),
+                rebuilt=[],
+                torn_down=[],
+            )
+        fixtures = {}
+        for fixturename in self._request.fixturenames:
+            try:
+                fixtures[fixturename] = self.fixture(fixturename)
+            except Exception:
+                LOGGER.exception("Could not get fixture %s", fixturename)
+        return fixtures
+
+    def _context(self, context, lazy=False, setup_workers=None):
         if self.session is None:
             self.session_start()
         if context == "":
-            return self._dummy_context()
-        item = None
+            self.context_node = self._virtual_module()
+            return self._enter_context(self._dummy_item(self.context_node), lazy, setup_workers)
         root = self.session.config.rootpath.resolve()
         cwd = Path.cwd().resolve()
         try:
@@ -271,11 +949,8 @@ def test_exists():
         if prefix and context.startswith(prefix):
             context = context[len(prefix):]
         # TODO parse the context to better handle parametrization
-        # TODO find the right item as a tree traversal from the root instead
-        for item in getattr(self.session, 'items', []):
-            if item.nodeid.startswith(context):
-                break
-        if item is None or not item.nodeid.startswith(context):
+        item = self._index.first(context)
+        if item is None:
             if '::' in context:
                 fspath, _ = context.split('::', 1)
             else:
@@ -283,10 +958,12 @@ def test_exists():
                     fspath, _ = context.split('[', 1)
                 else:
                     fspath = context
-            self.collect(fspath)
-        for item in getattr(self.session, 'items', []):
-            if item.nodeid.startswith(context):
-                break
+            items = self.collect(fspath)
+            item = self._index.first(context)
+            if item is None and items:
+                # Node ids do not match the path outside of the rootdir,
+                # find the context node from the parents of the collected items
+                item = items[0]
         if item is None:
             raise Exception(
                 f"Unknown context {context}, "
@@ -308,42 +985,66 @@ def test_exists():
                 )
             self.context_node = item
             item = self._dummy_item(item, context_param)
-        if self.context_item is not None:
+        return self._enter_context(item, lazy, setup_workers)
+
+    def _enter_context(self, item, lazy, setup_workers):
+        before = _active_fixtures(self.session)
+        scope = None
+        if self.context_item is item:
+            # Entering the same context again gives fresh function fixtures
+            scope = _common_scope(item.parent, item)
+            self._teardown_if_needed(item, item.parent)
+        elif self.context_item is not None:
+            # Only the nodes not shared with the new context are torn down,
+            # so fixtures of the common scope (and above) are kept alive
+            scope = _common_scope(self.context_item, item)
             self._teardown_if_needed(self.context_item, item)
         self.context_item = item
-        if hasattr(item, "_request") and isinstance(item._request, bool):
+        if hasattr(item, "_initrequest"):
+            # Items (e.g. cached dummy items) can be setup again after a teardown
             item._initrequest()
-        self.config.hook.pytest_runtest_setup(item=item, when="setup")
+        autousenames = list(self.session._fixturemanager._getautousenames(item.nodeid))
+        if lazy:
+            item._request._fillfixtures = _fill_autouse_fixtures(item._request, autousenames)
+        elif setup_workers:
+            item._request._fillfixtures = concurrent_fill(item._request, autousenames, setup_workers)
+        try:
+            self.config.hook.pytest_runtest_setup(item=item, when="setup")
+        finally:
+            # A later run of the item must setup its fixtures the usual way
+            item._request.__dict__.pop("_fillfixtures", None)
         self._request = self.context_item._request
         fixtures = {}
         extra_fixtures = []
         if inspect.ismethod(self._request.node.obj):
             extra_fixtures.append("self")
         for fixturename in (*self._request.fixturenames, *extra_fixtures):
+            if lazy and fixturename != "self":
+                fixtures[fixturename] = LazyFixture(self, fixturename)
+                continue
             try:
                 fixtures[fixturename] = self.fixture(fixturename)
             except Exception:
                 LOGGER.exception("Could not get fixture %s", fixturename)
+        after = _active_fixtures(self.session)
+        self.last_switch = ContextSwitch(
+            scope=scope,
+            reused=sorted(fdef.argname for fdef, result in after.items() if before.get(fdef) is result),
+            rebuilt=sorted(fdef.argname for fdef, result in after.items() if before.get(fdef) is not result),
+            torn_down=sorted(fdef.argname for fdef in before if fdef not in after),
+        )
         return fixtures
 
     def _reload(self):
-        reloaded = False
-        # TODO is it possible to reload the fixtures/fixture code?
         if self.context_item is None:
-            return reloaded
-        module = self.context_item
-        while not isinstance(module, pytest.Module):
-            if module is None:
-                return reloaded
-            module = module.parent
-        if module.fspath is None:
-            return
-        path = Path(str(module.fspath))
-        mtime = path.stat().st_mtime
-        if self._mtime is not None and mtime > self._mtime:
-            reload(module.obj)
-            reloaded = True
-        self._mtime = mtime
+            return []
+        reloaded = self._reloader.reload_changed()
+        if reloaded:
+            self._dummy_items.clear()
+        for module in reloaded:
+            _reload_fixtures(self.session._fixturemanager, module)
+            if getattr(module, "__file__", None):
+                self._collection_cache.invalidate(Path(module.__file__))
         item = self.context_item
         while item is not None:
             if isinstance(item, pytest.Function) and getattr(item, "name", "") == "dummy":
@@ -356,6 +1057,30 @@ def test_exists():
             item = item.parent
         return reloaded
 
+    def context_completions(self, prefix=""):
+        """Contexts (node ids) completing the prefix, one level at a time.
+
+        They come from the collected nodes and from a scan of the test files in the background.
+        A test file is only collected when its content is being completed.
+        """
+        if self.session is None:
+            return []
+        self._completions.scan_in_background(
+            str(self.config.rootdir),
+            self.config.getini("python_files"),
+            self.config.getini("norecursedirs"),
+        )
+        if "::" in prefix:
+            path = prefix.split("::", 1)[0]
+            if path in self._completions and not self._completions.complete(f"{path}::"):
+                # Do not wait if a run is in progress
+                if self._lock.acquire(blocking=False):
+                    try:
+                        self._collect_completions(path)
+                    finally:
+                        self._lock.release()
+        return self._completions.complete(prefix)
+
     def _relative_name(self, item):
         abs_part = self.context_node.nodeid
         if not item.nodeid.startswith(abs_part):
@@ -367,26 +1092,42 @@ def test_exists():
 
     def runtests(self, args=tuple()):
         """Run the tests under the current context."""
-        parser = argparse.ArgumentParser(
-            prog='pytest_runtests',
-            description='Run tests under the current context'
-        )
-        parser.add_argument('tests',
-                            nargs='*',
-                            metavar="TEST",
-                            default=tuple(),
-                            help='Test names to run, relative to the current context')
-        parser.add_argument('-k',
-                            metavar="EXPRESSION",
-                            default=None,
-                            help='only run tests which match the given substring expression')
-        parser.add_argument('-m',
-                            metavar="MARKEXPR",
-                            default=None,
-                            help='only run tests matching given mark expression')
+        for _ in self.iter_runtests(args):
+            pass
+
+    def runtests_in_background(self, args=tuple()):
+        """Run :meth:`runtests` in a background thread, which can be stopped with :meth:`cancel`.
+
+        Returns the :class:`.background.BackgroundRun`.
+        Meanwhile, :meth:`fixture` returns the values the fixtures of the context had when the run started,
+        the other fixtures are not available. Context switches and other runs wait for it to finish.
+        """
+        if self._background is not None and self._background.is_alive():
+            raise RuntimeError("Tests are already running in the background")
+        with self._lock:
+            # The run sets up and tears down the fixture definitions the context request uses
+            self._background_fixtures = _fixture_values(self.request)
+            self._background = BackgroundRun(lambda: self.iter_runtests(args))
+            self._background.start()
+        return self._background
+
+    def cancel(self, wait=True):
+        """Stop the background run after the current test, return its status (None if there is none)."""
+        if self._background is None:
+            return None
+        self._background.cancel(wait)
+        return self._background.status()
+
+    def iter_runtests(self, args=tuple()):
+        """Run the tests under the current context, yielding the reports of each phase as they complete.
+
+        The arguments are the same as for :meth:`runtests`.
+        Closing the iterator stops the run, after the current test (the fixtures it needs are torn down).
+        With ``-n`` or ``--fork``, the reports are only yielded once all the tests ran.
+        """
         if isinstance(args, str):
             args = shlex.split(args)
-        arguments = parser.parse_args(args)
+        arguments = _parse_runtests_args(args)
         restore_keyword = []
         restore_markexpr = []
         if arguments.k:
@@ -396,14 +1137,76 @@ def test_exists():
             restore_markexpr.append(self.config.option.markexpr)
             self.config.option.markexpr = arguments.m
         try:
-            self._runtests(arguments.tests)
+            with self._lock:
+                self.history.start_run(args)
+                yield from self._runtests(
+                    arguments.tests,
+                    numprocesses=arguments.n,
+                    fork=arguments.fork,
+                    changed=arguments.changed,
+                    affected=arguments.affected,
+                    setup_workers=arguments.setup_workers,
+                    repeat=arguments.repeat,
+                    until_fail=arguments.until_fail,
+                    last_failed=arguments.last_failed,
+                    failed_first=arguments.failed_first,
+                    stepwise=arguments.stepwise,
+                )
         finally:
             if restore_markexpr:
                 self.config.option.markexpr = restore_markexpr[0]
             if restore_keyword:
                 self.config.option.keyword = restore_keyword[0]
 
-    def _runtests(self, testnames):
+    def _worker_pool(self, numprocesses, restart=False):
+        if self._workers is not None:
+            if restart or self._workers.numprocesses != numprocesses or not self._workers.is_alive():
+                self._workers.stop()
+                self._workers = None
+        if self._workers is None:
+            self._workers = WorkerPool(self, numprocesses)
+        return self._workers
+
+    def _fork_server(self, restart=False):
+        if self._forkserver is not None and (restart or not self._forkserver.is_alive()):
+            self._forkserver.stop()
+            self._forkserver = None
+        if self._forkserver is None:
+            self._forkserver = ForkServer(self)
+        return self._forkserver
+
+    def _stop_background(self):
+        self.unwatch()
+        self.cancel()
+        if self._workers is not None:
+            self._workers.stop()
+            self._workers = None
+        if self._forkserver is not None:
+            self._forkserver.stop()
+            self._forkserver = None
+
+    def _impact_map(self):
+        if self._impact is None:
+            self._impact = ImpactMap([self.config.rootdir])
+        if not self.config.pluginmanager.is_registered(self._impact):
+            self.config.pluginmanager.register(self._impact, "interactive_impact")
+        return self._impact
+
+    def _run_protocol(self, item, nextitem, setup_workers=None):
+        if setup_workers and hasattr(item, "_request"):
+            if isinstance(item._request, bool):
+                item._initrequest()
+            autousenames = list(self.session._fixturemanager._getautousenames(item.nodeid))
+            item._request._fillfixtures = concurrent_fill(item._request, autousenames, setup_workers)
+        try:
+            self.config.hook.pytest_runtest_protocol(item=item, nextitem=nextitem)
+        finally:
+            if getattr(item, "_request", None):
+                item._request.__dict__.pop("_fillfixtures", None)
+
+    def _runtests(self, testnames, numprocesses=None, fork=False, changed=False, affected=False,
+                  setup_workers=None, repeat=None, until_fail=False, last_failed=False, failed_first=False,
+                  stepwise=False):
         reloaded = self._reload()
         if self.context_item is self.context_node:
             items = [self.context_item]
@@ -419,20 +1222,240 @@ def test_exists():
                 if regex.match(self._relative_name(item)):
                     new_items.append(item)
             items[:] = new_items
+        if changed:
+            items[:] = [item for item in items if _module_object(item) in reloaded]
+        if affected:
+            items[:] = self._impact_map().affected(items)
+        if last_failed or failed_first:
+            lastfailed = self._outcomes.lastfailed
+            failed = [item for item in items if item.nodeid in lastfailed]
+            # Like pytest, all the tests run when none failed
+            if last_failed and failed:
+                items[:] = failed
+            elif failed_first:
+                items[:] = failed + [item for item in items if item.nodeid not in lastfailed]
+        if stepwise and self._outcomes.stepwise is not None:
+            nodeids = [item.nodeid for item in items]
+            if self._outcomes.stepwise in nodeids:
+                del items[:nodeids.index(self._outcomes.stepwise)]
         if reloaded:
             _reload_items(items)
+        reports = _ReportBuffer()
+        self.config.pluginmanager.register(reports, "interactive_reports")
+        try:
+            if numprocesses is not None and numprocesses > 1:
+                # Workers forked before a reload run outdated code
+                pool = self._worker_pool(numprocesses, restart=reloaded)
+                pool.run(self.context_node.nodeid, items)
+            elif fork:
+                self._fork_server(restart=reloaded).run(self.context_node.nodeid, items)
+            else:
+                yield from self._run_serially(items, lastitem, reports, setup_workers, repeat, until_fail,
+                                              stepwise)
+            yield from reports.pop()
+        finally:
+            self.config.pluginmanager.unregister(reports)
+            self._outcomes.save(self.config)
+            self.config.hook.pytest_terminal_summary(
+                terminalreporter=self.config.pluginmanager.get_plugin('terminalreporter'),
+                exitstatus=0,
+                config=self.config,
+            )
+            # Clear the reports so they do not constantly show up
+            self.config.pluginmanager.get_plugin('terminalreporter').stats.clear()
+
+    def _run_serially(self, items, lastitem, reports, setup_workers, repeat, until_fail, stepwise):
         if items:
             self._teardown_if_needed(lastitem, items[0])
-        for i, item in enumerate(items):
-            nextitem = items[i + 1] if i + 1 < len(items) else lastitem
-            self.config.hook.pytest_runtest_protocol(item=item, nextitem=nextitem)
-        self.config.hook.pytest_terminal_summary(
-            terminalreporter=self.config.pluginmanager.get_plugin('terminalreporter'),
-            exitstatus=0,
-            config=self.config,
+        if self.context_item in items:
+            # Already setup by the context, but its fixtures may not be (lazy context)
+            try:
+                self.context_item._request._fillfixtures()
+            except Exception:
+                LOGGER.exception("Could not setup the fixtures of %s", self.context_item.nodeid)
+        repeated = repeat is not None or until_fail
+        if repeated:
+            self.last_durations = DurationRecorder()
+            self.config.pluginmanager.register(self.last_durations, "interactive_durations")
+        failures = self._outcomes.failures
+        run_items = self._run_items(
+            items,
+            lastitem,
+            setup_workers,
+            repeat=repeat if repeated else 1,
+            stop_on_failure=until_fail or stepwise,
         )
-        # Clear the reports so they do not constantly show up
-        self.config.pluginmanager.get_plugin('terminalreporter').stats.clear()
+        try:
+            for _ in run_items:
+                yield from reports.pop()
+        finally:
+            run_items.close()
+            if repeated:
+                self.config.pluginmanager.unregister(self.last_durations)
+        if repeated:
+            self.last_durations.report(self.config.pluginmanager.get_plugin('terminalreporter'))
+        if stepwise:
+            self._outcomes.stepwise = (
+                self._outcomes.last_failure if self._outcomes.failures != failures else None
+            )
+
+    def _run_items(self, items, lastitem, setup_workers, repeat=1, stop_on_failure=False):
+        # Repeated until a failure if repeat is None, yields after each item.
+        # The last item of a run is followed by the first one, so only its own scope is torn down.
+        # Stopping early tears down what the last item does not need
+        failures = self._outcomes.failures
+        run = 0
+        item = nextitem = None
+        try:
+            while items and (repeat is None or run < repeat):
+                run += 1
+                last_run = run == repeat
+                for i, item in enumerate(items):
+                    if i + 1 < len(items):
+                        nextitem = items[i + 1]
+                    elif last_run:
+                        nextitem = lastitem
+                    elif len(items) > 1:
+                        nextitem = items[0]
+                    else:
+                        # The item must be torn down to be setup again
+                        nextitem = self._dummy_item(item.parent)
+                    self._run_protocol(item, nextitem, setup_workers)
+                    yield item
+                    if stop_on_failure and self._outcomes.failures != failures:
+                        return
+        finally:
+            if item is not None and nextitem is not lastitem:
+                self._teardown_if_needed(item, lastitem)
+
+    def watch(self, args=tuple(), interval=0.5):
+        """Re-run the tests of the current context depending on the changed files, in the background.
+
+        The tracked files (test modules, conftests and the local modules they import) are polled
+        every ``interval`` seconds, ``args`` are passed to :meth:`runtests`.
+        Invalid arguments raise ``SystemExit`` here, not in the watcher thread.
+        """
+        if isinstance(args, str):
+            args = shlex.split(args)
+        args = ["--changed", *args]
+        _parse_runtests_args(args)
+        self.unwatch()
+        if self.context_item is None:
+            self.context()
+
+        def run_changed(paths):
+            try:
+                self.runtests(args)
+            except SystemExit:
+                LOGGER.error("The run of the changed tests exited")
+
+        self._watcher = FileWatcher(self._reloader.tracked_paths, run_changed, interval=interval)
+        self._watcher.start()
+
+    def unwatch(self):
+        """Stop watching for changes."""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def profile(self, function, *args, sampling=False, **kwargs):
+        """Profile ``function(*args, **kwargs)``, e.g. :meth:`runtests`, :meth:`context` or :meth:`fixture`.
+
+        Returns a :class:`.profiling.PhaseProfiler`, which splits the time spent between collection,
+        setup, fixture setup, call, teardown and other (e.g. reloading).
+        With ``sampling``, the whole call is profiled with pyinstrument instead.
+        Tests run in worker processes (``-n``, ``--fork``) are not profiled.
+        """
+        profiler = SamplingProfiler() if sampling else PhaseProfiler()
+        self.config.pluginmanager.register(profiler, "interactive_profiler")
+        try:
+            with profiler.phase("other"):
+                function(*args, **kwargs)
+        finally:
+            self.config.pluginmanager.unregister(profiler)
+        return profiler
+
+    def timeit(self, test="", number=None, repeat=7, save_baseline=False):
+        """Time the call of a test, its fixtures being setup once, like IPython's ``%timeit``.
+
+        The test is given relative to the current context, or is the current context.
+        Another test is timed in a temporary context, the current context is restored afterwards.
+        The number of calls per run is calibrated if not given.
+        The result is compared to the baseline of the test, saved with ``save_baseline``
+        (also in the pytest cache, if enabled).
+        """
+        with self._lock:
+            if test:
+                items = [item for item in self.collect(self.context_node.nodeid)
+                         if self._relative_name(item) == test]
+                if not items:
+                    raise KeyError(f"No test {test} in the current context")
+                if items[0] is not self.context_item:
+                    with self._temporary_context(items[0].nodeid):
+                        result = self._timeit(number, repeat)
+                else:
+                    result = self._timeit(number, repeat)
+            else:
+                result = self._timeit(number, repeat)
+        result.baseline = self._baseline(result.nodeid)
+        if save_baseline:
+            self._save_baseline(result)
+        return result
+
+    def _timeit(self, number, repeat):
+        item = self.context_item
+        if item is None or item is not self.context_node:
+            raise ValueError("The current context is not a test")
+        # Already setup by the context, but its fixtures may not be (lazy context)
+        item._request._fillfixtures()
+        function = item.obj
+        arguments = {argname: item.funcargs[argname] for argname in item._fixtureinfo.argnames}
+        timer = timeit.Timer(lambda: function(**arguments))
+        if number is None:
+            number, _ = timer.autorange()
+        return TimingResult(item.nodeid, number, timer.repeat(repeat, number))
+
+    @contextmanager
+    def _temporary_context(self, nodeid):
+        """Switch to the given context, then back to the current one.
+
+        The current context is put aside like a named context: its fixtures are kept,
+        unless the temporary context does not share its module.
+        """
+        name = self.context_name
+        if name is None:
+            self.context_name = _PREVIOUS_CONTEXT
+        previous = self.context_name
+        try:
+            self.context(nodeid, name=_TIMED_CONTEXT)
+            yield
+        finally:
+            self.context(name=previous)
+            self.context_name = name
+            if _TIMED_CONTEXT in self._contexts:
+                self._contexts[_TIMED_CONTEXT].finish()
+                self._contexts.pop(_TIMED_CONTEXT, None)
+
+    def _baseline(self, nodeid):
+        if nodeid not in self._baselines and getattr(self.config, "cache", None) is not None:
+            saved = self.config.cache.get("exploratory/timeit", {}).get(nodeid)
+            if saved is not None:
+                self._baselines[nodeid] = TimingResult(nodeid, *saved)
+        return self._baselines.get(nodeid)
+
+    def _save_baseline(self, result):
+        self._baselines[result.nodeid] = TimingResult(result.nodeid, result.loops, result.timings)
+        if getattr(self.config, "cache", None) is not None:
+            saved = self.config.cache.get("exploratory/timeit", {})
+            saved[result.nodeid] = [result.loops, result.timings]
+            self.config.cache.set("exploratory/timeit", saved)
+
+    def fixture_times(self, fixturename=None):
+        """Lines of the tree of the fixture setup/teardown times, following the fixture dependencies.
+
+        Restricted to the given fixture (and its dependencies) if any, see :class:`.profiling.FixtureTimer`.
+        """
+        return self.fixture_timer.tree(fixturename)
 
     def fixture(self, fixturename):
         """Return the value of the given fixture."""
@@ -441,6 +1464,13 @@ def test_exists():
 
     def fixture_with_name(self, fixturename):
         """Return the name and value of the given fixture."""
+        if self._background is not None and self._background.is_alive():
+            if fixturename not in self._background_fixtures:
+                raise RuntimeError(
+                    f"Fixture {fixturename} was not setup when the background run started, "
+                    f"wait for the run to finish or cancel it"
+                )
+            return fixturename, self._background_fixtures[fixturename]
         if fixturename == "self":
             value = getattr(self._request.node.obj, "__self__", None)
             if value is not None:
@@ -505,20 +1535,32 @@ def test_exists():
         if hasattr(callspec, "indices"):
             callspec.indices[fixturename] = ids.index(param)
 
+    def _fixture_names(self, expand_ids):
+        self._fixture_index.update(self.session._fixturemanager._arg2fixturedefs)
+        for name in self._fixture_index.names():
+            yield name
+            if self.context_item is not None and expand_ids(name):
+                for paramid in self._fixture_index.ids(name, self._fixture_ids):
+                    yield f"{name}[{paramid}]"
+
     @property
     def fixturenames(self):
+        """Names of the fixtures, including ``name[param_id]`` for parametrized fixtures."""
         if self.session is None:
             return tuple()
-        fixturenames = []
-        if self._fixturenames is None:
-            for name, fdef in self.session._fixturemanager._arg2fixturedefs.items():
-                fdef = fdef[-1]
-                fixturenames.append(name)
-                if fdef.params:
-                    for paramid in self._fixture_ids(name):
-                        fixturenames.append(f"{name}[{paramid}]")
-            self._fixturenames = tuple(fixturenames)
-        return self._fixturenames
+        return tuple(self._fixture_names(lambda name: True))
+
+    def fixture_completions(self, prefix=""):
+        """Fixture names starting with the prefix.
+
+        Parameter ids are only added for the fixtures whose full name is in the prefix.
+        """
+        if self.session is None:
+            return []
+        return [
+            name for name in self._fixture_names(lambda name: prefix.startswith(name))
+            if name.startswith(prefix)
+        ]
 
     @property
     def request(self):
@@ -529,6 +1571,7 @@ def test_exists():
 
     def session_stop(self):
         """Stop the test session (runs teardown)."""
+        self._stop_background()
         # FIXME why is it in a bad state in the first place?
         setupstate = self.session._setupstate
         to_delete = []
@@ -539,8 +1582,25 @@ def test_exists():
             del setupstate._finalizers[colitem]
         self.session.startdir.chdir()
         self.config.hook.pytest_sessionfinish(session=self.session, exitstatus=0)
+        self.config.pluginmanager.unregister(self.history)
+        self.history.close()
+        self.history = None
         self.session = None
 
+    def restart(self):
+        """Stop the test session and start a new one, reusing the config and the loaded plugins.
+
+        Much faster than :meth:`stop` and :meth:`start`: only the per-session state is reset.
+        The fixtures are torn down and the modules changed since they were imported are reloaded.
+        """
+        if self.session is not None:
+            self.session_stop()
+        if self._reloader is not None:
+            self._reloader.reload_changed()
+        self.fixture_timer.clear()
+        self.last_durations = None
+        self.session_start()
+
     def stop(self):
         """Stop pytest."""
         self.config._ensure_unconfigure()
@@ -1,13 +1,23 @@
 """Integration with IPython/Jupyter."""
 
+import re
 import atexit
+import time
 import shlex
+import argparse
 from tempfile import TemporaryDirectory
 from IPython.core.magic import Magics, magics_class, line_magic
 from IPython.core.error import UsageError
 from typing import Optional, Callable, Any
 import warnings
-from pytest_exploratory.interactive import InteractiveSession
+from pytest_exploratory.interactive import InteractiveSession, LazyFixture
+from pytest_exploratory.profiling import SORT_KEYS
+
+
+# Options of %pytest_context, only parsed before the context: node ids can contain spaces and quotes
+_CONTEXT_OPTION = re.compile(
+    r"""\s*(-h|--help|--lazy|(?:--setup-workers|--as)(?:=|\s+)(?:'[^']*'|"[^"]*"|\S+))(?=\s|$)"""
+)
 
 
 sphinxify: Optional[Callable[[Any], Any]]
@@ -64,10 +74,49 @@ class PytestMagics(Magics):
         """Get into the given pytest context.
 
         If the context is a full test name, the fixtures are setup and put into corresponding variables.
+        With ``--lazy``, the fixtures are only setup when their variable is first used.
+        With ``--setup-workers NUM``, independent fixtures are setup concurrently in NUM threads.
+        With ``--as NAME``, the context stays active when switching to another one,
+        and ``%pytest_context --as NAME`` switches back to it without setting anything up.
         """
-        context = context.strip()
-        variables = self._session.context(context)
+        parser = argparse.ArgumentParser(
+            prog='pytest_context',
+            description='Get into the given pytest context'
+        )
+        parser.add_argument('context', nargs='?', default="",
+                            help='Context (node id) to get into, after the options')
+        parser.add_argument('--lazy', action='store_true', help='only setup fixtures when first used')
+        parser.add_argument('--setup-workers', metavar="NUM", type=int, default=None,
+                            help='setup independent fixtures concurrently in NUM threads')
+        parser.add_argument('--as', metavar="NAME", dest='name', default=None,
+                            help='name of the context, to keep it active and switch back to it')
+        options = []
+        match = _CONTEXT_OPTION.match(context)
+        while match:
+            options.append(match.group(1))
+            context = context[match.end():]
+            match = _CONTEXT_OPTION.match(context)
+        try:
+            arguments = parser.parse_args(shlex.split(" ".join(options)))
+        except ValueError as error:
+            raise UsageError(str(error))
+        except SystemExit:
+            return
+        variables = self._session.context(
+            context.strip(),
+            lazy=arguments.lazy,
+            setup_workers=arguments.setup_workers,
+            name=arguments.name,
+        )
         self.shell.push(variables)
+        for value in variables.values():
+            if isinstance(value, LazyFixture):
+                value._bind(self.shell.user_ns)
+        switch = self._session.last_switch
+        if switch is not None and switch.scope is not None:
+            print(f"Kept {switch.scope} scope, "
+                  f"reused: {', '.join(switch.reused) or '-'}, "
+                  f"rebuilt: {', '.join(switch.rebuilt) or '-'}")
 
     @line_magic
     def pytest_contextinfo(self, level):
@@ -125,18 +174,188 @@ class PytestMagics(Magics):
         docformat = sphinxify if self.shell.sphinxify_docstring else None
         self.shell.inspector.pinfo(definition.func, detail_level=2, formatter=docformat)
 
+    @line_magic
+    def pytest_fixturetimes(self, line=""):
+        """Show the setup/teardown times of the fixtures, as a tree following their dependencies.
+
+        E.g.: ``%pytest_fixturetimes my_fixture``, ``--reset`` clears the recorded times.
+        """
+        parser = argparse.ArgumentParser(
+            prog='pytest_fixturetimes',
+            description='Show the setup/teardown times of the fixtures'
+        )
+        parser.add_argument('fixture', nargs='?', default=None,
+                            help='only show this fixture and its dependencies')
+        parser.add_argument('--reset', action='store_true', help='clear the recorded times')
+        try:
+            arguments = parser.parse_args(shlex.split(line))
+        except SystemExit:
+            return
+        if arguments.reset:
+            self._session.fixture_timer.clear()
+            return
+        for line in self._session.fixture_times(arguments.fixture):
+            print(line)
+
     def pytest_fixture_completer(self, ipython, event):
-        return self._session.fixturenames
+        return self._session.fixture_completions(event.symbol)
+
+    def pytest_context_completer(self, ipython, event):
+        words = event.line.split()
+        prefix = words[-1] if len(words) > 1 and not event.line.endswith(" ") else ""
+        # IPython completes the last symbol, which stops at delimiters such as ":"
+        start = len(prefix) - len(event.symbol)
+        return [completion[start:] for completion in self._session.context_completions(prefix)]
 
     @line_magic
     def pytest_runtests(self, line=""):
-        """Run the tests in the current context."""
+        """Run the tests in the current context.
+
+        With ``--background``, the tests run in a background thread (without pdb),
+        which can be stopped with ``%pytest_cancel``.
+        """
+        args = shlex.split(line)
+        if "--background" in args:
+            args.remove("--background")
+            try:
+                self._session.runtests_in_background(args)
+            except RuntimeError as error:
+                raise UsageError(str(error))
+            print("Running in the background, %pytest_cancel to stop")
+            return
         with self._session.temporary_pdb(self.shell.call_pdb):
             try:
-                self._session.runtests(shlex.split(line))
+                self._session.runtests(args)
             except SystemExit:
                 pass
 
+    @line_magic
+    def pytest_cancel(self, line=""):
+        """Stop the background run after the current test (its fixtures not needed anymore are torn down)."""
+        status = self._session.cancel()
+        if status is None:
+            raise UsageError("No background run")
+        print(f"Background run {status}")
+
+    @line_magic
+    def pytest_profile(self, line=""):
+        """Profile ``%pytest_runtests``, ``%pytest_context`` or ``%pytest_fixture``, split by phase.
+
+        E.g.: ``%pytest_profile --sort tottime --output slow runtests -k slow``
+        """
+        parser = argparse.ArgumentParser(
+            prog='pytest_profile',
+            description='Profile a pytest magic, split by phase (collection, setup, call, teardown)'
+        )
+        parser.add_argument('--sort', choices=SORT_KEYS, default="cumulative", help='sort the functions by')
+        parser.add_argument('--limit', metavar="NUM", type=int, default=20,
+                            help='number of functions to show per phase')
+        parser.add_argument('--output', metavar="PREFIX", default=None,
+                            help='save the profiles to PREFIX.<phase>.pstats '
+                                 '(PREFIX.speedscope.json with --sampling)')
+        parser.add_argument('--sampling', action='store_true',
+                            help='use the pyinstrument sampling profiler (not split by phase)')
+        parser.add_argument('command', choices=("runtests", "context", "fixture"), help='magic to profile')
+        parser.add_argument('args', nargs=argparse.REMAINDER, help='arguments of the magic')
+        try:
+            arguments = parser.parse_args(shlex.split(line))
+        except SystemExit:
+            return
+        magic = getattr(self, f"pytest_{arguments.command}")
+        try:
+            profiler = self._session.profile(
+                magic,
+                " ".join(shlex.quote(arg) for arg in arguments.args),
+                sampling=arguments.sampling,
+            )
+        except ImportError as error:
+            raise UsageError(str(error))
+        profiler.report(sort=arguments.sort, limit=arguments.limit)
+        if arguments.output:
+            for filename in profiler.dump(arguments.output):
+                print(f"Saved {filename}")
+
+    @line_magic
+    def pytest_timeit(self, line=""):
+        """Time the call of a test (the current context by default), its fixtures being setup once.
+
+        E.g.: ``%pytest_timeit -r 10 test_parse``, ``--save`` saves the result as the baseline of the test.
+        """
+        parser = argparse.ArgumentParser(
+            prog='pytest_timeit',
+            description='Time the call of a test, its fixtures being setup once'
+        )
+        parser.add_argument('test', nargs='?', default="",
+                            help='test to time, relative to the current context')
+        parser.add_argument('-n', metavar="NUM", type=int, default=None,
+                            help='calls per run (calibrated by default)')
+        parser.add_argument('-r', metavar="NUM", type=int, default=7, help='number of runs')
+        parser.add_argument('--save', action='store_true', help='save the result as the baseline of the test')
+        try:
+            arguments = parser.parse_args(shlex.split(line))
+        except SystemExit:
+            return
+        try:
+            result = self._session.timeit(arguments.test, number=arguments.n, repeat=arguments.r,
+                                          save_baseline=arguments.save)
+        except (KeyError, ValueError) as error:
+            raise UsageError(str(error))
+        print(result)
+
+    @line_magic
+    def pytest_history(self, line=""):
+        """Query the history of the interactive runs (kept in the pytest cache).
+
+        E.g.: ``%pytest_history slowest``, ``%pytest_history slower``,
+        ``%pytest_history trend tests/test_mytest.py::test_case``
+        """
+        parser = argparse.ArgumentParser(
+            prog='pytest_history',
+            description='Query the history of the interactive runs'
+        )
+        parser.add_argument('query', nargs='?', choices=("slowest", "slower", "trend"), default="slowest",
+                            help='slowest tests, tests which got slower since their previous run, '
+                                 'or the runs of a test')
+        parser.add_argument('nodeid', nargs='?', default=None, help='test of the trend')
+        parser.add_argument('-n', metavar="NUM", type=int, default=10, help='number of results')
+        try:
+            arguments = parser.parse_args(shlex.split(line))
+        except SystemExit:
+            return
+        history = self._session.history
+        if history is None:
+            raise UsageError("Pytest session not started")
+        if arguments.query == "slowest":
+            for nodeid, outcome, duration in history.slowest(arguments.n):
+                print(f"{duration:.4f}s {outcome:8} {nodeid}")
+        elif arguments.query == "slower":
+            for nodeid, previous, last in history.slower(limit=arguments.n):
+                print(f"{previous:.4f}s -> {last:.4f}s {nodeid}")
+        else:
+            if arguments.nodeid is None:
+                raise UsageError("trend needs a test node id")
+            for started, _, outcome, setup, call, teardown, code_hash in history.trend(
+                    arguments.nodeid, arguments.n):
+                print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started))} {outcome:8} "
+                      f"setup {setup:.4f}s call {call:.4f}s teardown {teardown:.4f}s "
+                      f"code {(code_hash or '-')[:8]}")
+
+    @line_magic
+    def pytest_watch(self, line=""):
+        """Re-run the tests of the current context when the code they depend on is edited.
+
+        The tests run in the background, the arguments are the same as for ``%pytest_runtests``.
+        """
+        try:
+            self._session.watch(shlex.split(line))
+        except SystemExit:
+            pass
+
+    @line_magic
+    def pytest_watch_stop(self, line=""):
+        """Stop re-running the tests on changes."""
+        self._session.unwatch()
+
     def _try_pytest_session_stop(self):
         if self._session.session is None:
             return
@@ -147,6 +366,17 @@ class PytestMagics(Magics):
     def shutdown_hook(self):
         self._try_pytest_session_stop()
 
+    @line_magic
+    def pytest_session_restart(self, data=""):
+        """Restart the pytest session, reusing its configuration and plugins.
+
+        The fixtures are torn down, the changed modules are reloaded.
+        """
+        if self._session.session is None:
+            raise UsageError("Pytest session not started")
+        self._session.restart()
+        self.shell.push({"pytest_session": self._session})
+
     @line_magic
     def pytest_session_stop(self, data=""):
         """Stop the pytest session.
@@ -168,7 +398,7 @@ def load_ipython_extension(ipython):
     ipython.register_magics(console)
     atexit.register(console.shutdown_hook)
     ipython.set_hook('complete_command', console.pytest_fixture_completer, re_key='%pytest_fixture')
-    # TODO autocomplete for pytest_context
+    ipython.set_hook('complete_command', console.pytest_context_completer, re_key='%pytest_context')
     ipython.events.register('shell_initialized', _shell_initialized)
 
 
@@ -0,0 +1,352 @@
+"""Profile the operations of an interactive session, split by pytest phase."""
+
+import io
+import sys
+import math
+import time
+import statistics
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+import pytest
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+
+# CPU time of the current thread, fixtures can be setup concurrently
+_cpu_time = getattr(time, "thread_time", time.process_time)
+
+PHASES = ("collection", "setup", "fixture setup", "call", "teardown", "other")
+SORT_KEYS = ("cumulative", "tottime", "ncalls", "name", "filename")
+
+
+class PhaseProfiler:
+    """Plugin profiling each phase (collection, setup, fixture setup, call, teardown) with cProfile.
+
+    Only one profile is enabled at a time: entering a nested phase (e.g. a fixture setup
+    during the setup) pauses the profile of the outer phase.
+    Whatever runs outside of these pytest hooks is profiled as ``other``.
+    """
+
+    def __init__(self):
+        self.profiles = {phase: cProfile.Profile() for phase in PHASES}
+        self._used = set()
+        self._stack = []
+
+    @contextmanager
+    def phase(self, name):
+        """Profile the enclosed code as part of the given phase."""
+        if self._stack:
+            self.profiles[self._stack[-1]].disable()
+        self._stack.append(name)
+        self._used.add(name)
+        self.profiles[name].enable()
+        try:
+            yield
+        finally:
+            self.profiles[self._stack.pop()].disable()
+            if self._stack:
+                self.profiles[self._stack[-1]].enable()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_collection(self):
+        with self.phase("collection"):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self):
+        with self.phase("setup"):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self):
+        with self.phase("fixture setup"):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self):
+        with self.phase("call"):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self):
+        with self.phase("teardown"):
+            yield
+
+    def stats(self, phase, stream=None):
+        """:class:`pstats.Stats` of the given phase, or None if nothing ran in it."""
+        if phase not in self._used:
+            return None
+        return pstats.Stats(self.profiles[phase], stream=stream or sys.stdout)
+
+    def report(self, sort="cumulative", limit=20, stream=None):
+        """Print the hottest functions of each phase."""
+        stream = stream or sys.stdout
+        for phase in PHASES:
+            stats = self.stats(phase, stream)
+            if stats is None:
+                continue
+            stream.write(f"===== {phase}: {stats.total_tt:.3f}s =====\n")
+            stats.strip_dirs().sort_stats(sort).print_stats(limit)
+
+    def dump(self, prefix):
+        """Save the profile of each phase in ``<prefix>.<phase>.pstats``, return the file names."""
+        filenames = []
+        for phase in PHASES:
+            stats = self.stats(phase, io.StringIO())
+            if stats is None:
+                continue
+            filename = f"{prefix}.{phase.replace(' ', '_')}.pstats"
+            stats.dump_stats(filename)
+            filenames.append(filename)
+        return filenames
+
+
+class SamplingProfiler:
+    """Profile with the pyinstrument sampling profiler (not split by phase)."""
+
+    def __init__(self):
+        if pyinstrument is None:
+            raise ImportError("Sampling profiles require pyinstrument")
+        self.profiler = pyinstrument.Profiler()
+
+    @contextmanager
+    def phase(self, name):
+        self.profiler.start()
+        try:
+            yield
+        finally:
+            self.profiler.stop()
+
+    def report(self, sort=None, limit=None, stream=None):
+        (stream or sys.stdout).write(self.profiler.output_text())
+
+    def dump(self, prefix):
+        """Save the profile in ``<prefix>.speedscope.json``, return the file names."""
+        from pyinstrument.renderers import SpeedscopeRenderer
+        filename = f"{prefix}.speedscope.json"
+        with open(filename, "w") as output:
+            output.write(self.profiler.output(renderer=SpeedscopeRenderer()))
+        return [filename]
+
+
+def _param_id(fixturedef, request):
+    """Id of the parameter of a parametrized fixture (as pytest would show it), None otherwise."""
+    if not hasattr(request, "param"):
+        return None
+    index = getattr(request, "param_index", 0)
+    if fixturedef.ids is not None and not callable(fixturedef.ids):
+        return str(fixturedef.ids[index])
+    if isinstance(request.param, (str, int, float, bool, type(None))):
+        return str(request.param)
+    return f"{fixturedef.argname}{index}"
+
+
+class FixtureTime:
+    """Wall and CPU times of the setups and teardowns of a fixture (for one parameter)."""
+
+    def __init__(self, argname, param_id, scope, dependencies):
+        self.argname = argname
+        self.param_id = param_id
+        self.scope = scope
+        self.dependencies = dependencies
+        self.setups = 0
+        self.setup_wall = 0.0
+        self.setup_cpu = 0.0
+        self.teardowns = 0
+        self.teardown_wall = 0.0
+        self.teardown_cpu = 0.0
+
+    @property
+    def name(self):
+        return self.argname if self.param_id is None else f"{self.argname}[{self.param_id}]"
+
+    @property
+    def wall(self):
+        return self.setup_wall + self.teardown_wall
+
+
+class FixtureTimer:
+    """Plugin recording the setup and teardown times of each fixture and parameter.
+
+    The setup time excludes the fixtures it depends on, which are setup before.
+    The teardown is timed from a finalizer registered right after the setup,
+    so that it runs after the teardown of the dependent fixtures, until ``pytest_fixture_post_finalizer``.
+    """
+
+    def __init__(self):
+        self.times = {}
+        self._teardowns = {}
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self.times.clear()
+            self._teardowns.clear()
+
+    def _time(self, fixturedef, request):
+        param_id = _param_id(fixturedef, request)
+        key = fixturedef.argname, param_id
+        with self._lock:
+            if key not in self.times:
+                dependencies = tuple(
+                    argname for argname in fixturedef.argnames
+                    if argname not in ("request", fixturedef.argname)
+                )
+                self.times[key] = FixtureTime(fixturedef.argname, param_id, fixturedef.scope, dependencies)
+            return self.times[key]
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        wall, cpu = time.perf_counter(), _cpu_time()
+        yield
+        wall, cpu = time.perf_counter() - wall, _cpu_time() - cpu
+        fixture_time = self._time(fixturedef, request)
+        with self._lock:
+            fixture_time.setups += 1
+            fixture_time.setup_wall += wall
+            fixture_time.setup_cpu += cpu
+
+        def start_teardown():
+            with self._lock:
+                self._teardowns[fixturedef] = fixture_time, time.perf_counter(), _cpu_time()
+        fixturedef.addfinalizer(start_teardown)
+
+    def pytest_fixture_post_finalizer(self, fixturedef, request):
+        with self._lock:
+            started = self._teardowns.pop(fixturedef, None)
+            if started is None:
+                return
+            fixture_time, wall, cpu = started
+            fixture_time.teardowns += 1
+            fixture_time.teardown_wall += time.perf_counter() - wall
+            fixture_time.teardown_cpu += _cpu_time() - cpu
+
+    def cumulative(self, fixture_time, _seen=()):
+        """Wall time of the fixture, plus the cumulative time of the fixtures it depends on."""
+        seen = set(_seen) | {fixture_time.argname}
+        return fixture_time.wall + sum(
+            self.cumulative(dependency, seen)
+            for name in fixture_time.dependencies if name not in seen
+            for dependency in self._by_name(name)
+        )
+
+    def _by_name(self, argname):
+        return [fixture_time for (name, _), fixture_time in self.times.items() if name == argname]
+
+    def tree(self, argname=None):
+        """Lines of the tree of the fixture times, following the dependencies, costliest first.
+
+        The roots are the given fixture, or the fixtures no other recorded fixture depends on.
+        """
+        with self._lock:
+            if argname is not None:
+                roots = self._by_name(argname)
+            else:
+                dependencies = {
+                    name for fixture_time in self.times.values() for name in fixture_time.dependencies
+                }
+                roots = [fixture_time for fixture_time in self.times.values()
+                         if fixture_time.argname not in dependencies]
+            lines = []
+            self._tree_lines(roots, 0, set(), lines)
+        return lines
+
+    def _tree_lines(self, fixture_times, depth, seen, lines):
+        for fixture_time in sorted(fixture_times, key=self.cumulative, reverse=True):
+            lines.append(
+                f"{'  ' * depth}{fixture_time.name} ({fixture_time.scope}): "
+                f"cumulative {self.cumulative(fixture_time):.3f}s, "
+                f"setup x{fixture_time.setups} {fixture_time.setup_wall:.3f}s "
+                f"(cpu {fixture_time.setup_cpu:.3f}s), "
+                f"teardown x{fixture_time.teardowns} {fixture_time.teardown_wall:.3f}s "
+                f"(cpu {fixture_time.teardown_cpu:.3f}s)"
+            )
+            children = [
+                dependency
+                for name in fixture_time.dependencies if name not in seen
+                for dependency in self._by_name(name)
+            ]
+            self._tree_lines(children, depth + 1, seen | {fixture_time.argname}, lines)
+
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of sorted values."""
+    return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+
+class DurationRecorder:
+    """Plugin recording the call durations of the tests run repeatedly."""
+
+    def __init__(self):
+        self.durations = {}
+
+    def pytest_runtest_logreport(self, report):
+        if report.when == "call":
+            self.durations.setdefault(report.nodeid, []).append(report.duration)
+
+    def summary(self):
+        """``(nodeid, runs, min, median, p95, max)`` of each test, slowest median first."""
+        rows = []
+        for nodeid, durations in self.durations.items():
+            durations = sorted(durations)
+            rows.append((
+                nodeid, len(durations), durations[0], statistics.median(durations),
+                _percentile(durations, 95), durations[-1],
+            ))
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+    def report(self, terminalreporter):
+        terminalreporter.write_sep("=", "call durations (min / median / p95 / max)")
+        for nodeid, runs, minimum, median, p95, maximum in self.summary():
+            terminalreporter.write_line(
+                f"{minimum:.4f}s / {median:.4f}s / {p95:.4f}s / {maximum:.4f}s  x{runs}  {nodeid}"
+            )
+
+
+def _format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e3), ("us", 1e6)):
+        if seconds >= 1 / scale:
+            return f"{seconds * scale:.3g} {unit}"
+    return f"{seconds * 1e9:.3g} ns"
+
+
+class TimingResult:
+    """Timings of the repeated calls of a test, compared to its baseline if any."""
+
+    def __init__(self, nodeid, loops, timings, baseline=None):
+        self.nodeid = nodeid
+        self.loops = loops
+        # Total time of each run of ``loops`` calls
+        self.timings = timings
+        self.baseline = baseline
+
+    @property
+    def per_loop(self):
+        return [timing / self.loops for timing in self.timings]
+
+    @property
+    def best(self):
+        return min(self.per_loop)
+
+    @property
+    def mean(self):
+        return statistics.mean(self.per_loop)
+
+    @property
+    def stdev(self):
+        return statistics.stdev(self.per_loop) if len(self.timings) > 1 else 0.0
+
+    def __str__(self):
+        description = (
+            f"{self.nodeid}: {_format_time(self.mean)} +- {_format_time(self.stdev)} per loop "
+            f"(mean +- std. dev. of {len(self.timings)} runs, {self.loops} loops each)"
+        )
+        if self.baseline is not None:
+            ratio = self.mean / self.baseline.mean
+            description += f", {ratio:.2f}x the baseline ({_format_time(self.baseline.mean)})"
+        return description
@@ -0,0 +1,200 @@
+"""Detect changed modules and reload them with their dependents."""
+
+import sys
+import types
+import hashlib
+import logging
+from pathlib import Path
+import importlib.util
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def file_signature(path):
+    """Cheap signature of a file, to avoid hashing files which were not touched."""
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def file_hash(path):
+    """Hash of the content of a file."""
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+def _module_path(module):
+    filename = getattr(module, "__file__", None)
+    if not filename:
+        return None
+    return Path(filename).resolve()
+
+
+def _find_spec(module, path):
+    """Spec of the module from the import system (e.g. pytest's assertion rewriting), searched by path.
+
+    Only the directory of the module is searched: conftests outside of packages are all named
+    ``conftest`` and only the last one is in ``sys.modules``.
+    """
+    directory = path.parent.parent if path.name == "__init__.py" else path.parent
+    for finder in sys.meta_path:
+        find_spec = getattr(finder, "find_spec", None)
+        if find_spec is None:
+            continue
+        spec = find_spec(module.__name__, [str(directory)], module)
+        if spec is not None:
+            if spec.origin and Path(spec.origin).resolve() == path:
+                return spec
+            break
+    # Not found where it was imported from, e.g. its directory is not on sys.path anymore
+    old_spec = getattr(module, "__spec__", None)
+    return importlib.util.spec_from_file_location(
+        module.__name__, module.__file__,
+        submodule_search_locations=old_spec.submodule_search_locations if old_spec is not None else None,
+    )
+
+
+def _reload_module(module):
+    """Execute the module again from its own file, in place, like :func:`importlib.reload`."""
+    spec = _find_spec(module, _module_path(module))
+    module.__spec__ = spec
+    module.__loader__ = spec.loader
+    spec.loader.exec_module(module)
+    return module
+
+
+class ModuleReloader:
+    """Track the import graph of test modules and reload what changed.
+
+    Only the modules living under one of the given roots (and not in site-packages) are tracked.
+    The modules are identified by their resolved file path, not their name which may be ambiguous.
+    Changes are detected on the content hash of the files, the file signature (mtime/size)
+    is only used to skip hashing untouched files.
+    """
+
+    def __init__(self, roots=()):
+        self.roots = {Path(root).resolve() for root in roots}
+        self._files = {}
+        self._modules = {}
+        self._paths = {}
+        self._dependencies = {}
+        self._extra_dependencies = {}
+
+    def _is_local(self, path):
+        if path is None or "site-packages" in path.parts:
+            return False
+        return any(root == path or root in path.parents for root in self.roots)
+
+    def _hash(self, path):
+        try:
+            signature = file_signature(path)
+        except OSError:
+            return None
+        cached = self._files.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        content_hash = file_hash(path)
+        self._files[path] = signature, content_hash
+        return content_hash
+
+    def _direct_dependencies(self, module):
+        dependencies = {}
+        for value in list(vars(module).values()):
+            if isinstance(value, types.ModuleType):
+                dependency = value
+            else:
+                name = getattr(value, "__module__", None)
+                dependency = sys.modules.get(name) if isinstance(name, str) else None
+            if dependency is None or dependency is module:
+                continue
+            path = _module_path(dependency)
+            if self._is_local(path):
+                dependencies[path] = dependency
+        return dependencies
+
+    def is_tracked(self, module):
+        return module in self._paths
+
+    def track(self, module, extra_dependencies=()):
+        """Track a module, its (transitive) local dependencies and the given extra dependencies.
+
+        Extra dependencies are for what is not visible in the module namespace, e.g. conftests.
+        """
+        path = _module_path(module)
+        if path is None:
+            return
+        self.roots.add(path.parent)
+        work = [(path, module)]
+        while work:
+            dependency_path, dependency = work.pop()
+            if dependency_path in self._dependencies:
+                continue
+            self._modules[dependency_path] = dependency
+            self._paths[dependency] = dependency_path
+            self._hash(dependency_path)
+            dependencies = self._direct_dependencies(dependency)
+            self._dependencies[dependency_path] = set(dependencies)
+            work.extend(dependencies.items())
+        extra_paths = self._extra_dependencies.setdefault(path, set())
+        for extra in extra_dependencies:
+            extra_path = _module_path(extra)
+            if extra_path is not None and extra_path not in extra_paths:
+                self.track(extra)
+                extra_paths.add(extra_path)
+                self._dependencies[path].add(extra_path)
+
+    def tracked_paths(self):
+        """Files of the tracked modules."""
+        return list(self._files)
+
+    def changed(self):
+        """Paths of the tracked modules whose file content changed."""
+        changed = set()
+        for path, (_, old_hash) in list(self._files.items()):
+            if self._hash(path) != old_hash:
+                changed.add(path)
+        return changed
+
+    def _dependents(self, paths):
+        dependents = set(paths)
+        added = True
+        while added:
+            added = False
+            for path, dependencies in self._dependencies.items():
+                if path not in dependents and dependencies & dependents:
+                    dependents.add(path)
+                    added = True
+        return dependents
+
+    def _reload_order(self, paths):
+        # Dependencies are reloaded before their dependents
+        ordered = []
+        visited = set()
+
+        def visit(path):
+            if path in visited:
+                return
+            visited.add(path)
+            for dependency in sorted(self._dependencies.get(path, ())):
+                if dependency in paths:
+                    visit(dependency)
+            ordered.append(path)
+
+        for path in sorted(paths):
+            visit(path)
+        return ordered
+
+    def reload_changed(self):
+        """Reload the changed modules and their dependents, return the reloaded modules."""
+        reloaded = []
+        for path in self._reload_order(self._dependents(self.changed())):
+            module = self._modules[path]
+            try:
+                _reload_module(module)
+            except Exception:
+                LOGGER.exception("Could not reload %s", path)
+                continue
+            self._dependencies[path] = (
+                set(self._direct_dependencies(module)) | self._extra_dependencies.get(path, set())
+            )
+            reloaded.append(module)
+        return reloaded
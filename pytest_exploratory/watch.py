@@ -0,0 +1,70 @@
+"""Watch files for changes in a background thread."""
+
+import time
+import logging
+import threading
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _signature(path):
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class FileWatcher(threading.Thread):
+    """Poll the signature (mtime/size) of files and report the changed ones.
+
+    The files to watch are given by a callable, polled every ``interval`` seconds,
+    so that newly tracked files are picked up.
+    The callback is called once no other change happened during ``debounce`` seconds,
+    e.g. to wait for an editor to finish writing.
+    """
+
+    def __init__(self, get_paths, callback, interval=0.5, debounce=0.3):
+        super().__init__(name="pytest-exploratory-watcher", daemon=True)
+        self.get_paths = get_paths
+        self.callback = callback
+        self.interval = interval
+        self.debounce = debounce
+        self._stop_event = threading.Event()
+        self._signatures = {}
+
+    def _poll(self):
+        changed = set()
+        for path in list(self.get_paths()):
+            signature = _signature(path)
+            if path in self._signatures and self._signatures[path] != signature:
+                changed.add(path)
+            self._signatures[path] = signature
+        return changed
+
+    def start(self):
+        # Changes happening right after starting must not be missed
+        self._poll()
+        super().start()
+
+    def run(self):
+        pending = set()
+        last_change = 0.0
+        while not self._stop_event.wait(self.interval):
+            changed = self._poll()
+            if changed:
+                pending |= changed
+                last_change = time.monotonic()
+            if pending and time.monotonic() - last_change >= self.debounce:
+                paths, pending = pending, set()
+                try:
+                    self.callback(paths)
+                except Exception:
+                    LOGGER.exception("Could not handle the changes of %s", paths)
+
+    def stop(self):
+        """Stop watching, waiting for the current callback to finish."""
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
@@ -0,0 +1,273 @@
+"""Run tests of an interactive session in forked processes.
+
+:class:`WorkerPool` distributes the tests over persistent workers,
+:class:`ForkServer` runs each test run in a fresh fork of a warm template process.
+"""
+
+import os
+import logging
+import multiprocessing
+from multiprocessing.connection import wait
+import pytest
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def reset_fixture_state(session):
+    """Forget the fixtures setup by the process we were forked from, without finalizing them."""
+    setupstate = session._setupstate
+    setupstate.stack[:] = []
+    setupstate._finalizers.clear()
+    for fixturedefs in session._fixturemanager._arg2fixturedefs.values():
+        for fixturedef in fixturedefs:
+            fixturedef.cached_result = None
+            fixturedef._finalizers = []
+
+
+class _ReportForwarder:
+    """Send the runtest events of a worker to the parent process."""
+
+    def __init__(self, config, conn):
+        self.config = config
+        self.conn = conn
+
+    def pytest_runtest_logstart(self, nodeid, location):
+        self.conn.send(("logstart", nodeid, location))
+
+    def pytest_runtest_logreport(self, report):
+        data = self.config.hook.pytest_report_to_serializable(config=self.config, report=report)
+        self.conn.send(("report", data))
+
+    def pytest_runtest_logfinish(self, nodeid, location):
+        self.conn.send(("logfinish", nodeid, location))
+
+
+def _group_items(items):
+    """Group consecutive items of the same module, to share the module fixtures."""
+    groups = []
+    module = object()
+    for item in items:
+        item_module = item.getparent(pytest.Module)
+        if not groups or item_module is not module:
+            groups.append([])
+            module = item_module
+        groups[-1].append(item)
+    return groups
+
+
+def _prepare_child(interactive, conn):
+    config = interactive.config
+    reset_fixture_state(interactive.session)
+    # The parent reports the results
+    config.pluginmanager.unregister(name="terminalreporter")
+    # Recorded by the parent from the forwarded reports, the database connection is not fork safe
+    if config.pluginmanager.has_plugin("interactive_history"):
+        config.pluginmanager.unregister(name="interactive_history")
+    config.pluginmanager.register(_ReportForwarder(config, conn), "interactive_worker")
+    # The selection is done by the parent
+    config.option.keyword = ""
+    config.option.markexpr = ""
+
+
+def _select(interactive, conn, context_nodeid, nodeids):
+    items = {item.nodeid: item for item in interactive.collect(context_nodeid)}
+    selected = []
+    for nodeid in nodeids:
+        if nodeid in items:
+            selected.append(items[nodeid])
+        else:
+            conn.send(("error", f"Unknown test {nodeid} in process {os.getpid()}"))
+    return selected
+
+
+def _run_selected(config, selected, keep_module):
+    for i, item in enumerate(selected):
+        if i + 1 < len(selected):
+            nextitem = selected[i + 1]
+        elif keep_module:
+            nextitem = item.getparent(pytest.Module)
+        else:
+            nextitem = None
+        config.hook.pytest_runtest_protocol(item=item, nextitem=nextitem)
+
+
+def _worker_main(interactive, conn):
+    _prepare_child(interactive, conn)
+    while True:
+        message = conn.recv()
+        if message[0] == "stop":
+            break
+        _, context_nodeid, nodeids = message
+        selected = _select(interactive, conn, context_nodeid, nodeids)
+        # Keep the module fixtures for the next tests sent to this worker
+        _run_selected(interactive.config, selected, keep_module=True)
+        conn.send(("done",))
+    interactive.session._setupstate.teardown_all()
+
+
+def _forkserver_main(interactive, conn):
+    _prepare_child(interactive, conn)
+    while True:
+        message = conn.recv()
+        if message[0] == "stop":
+            break
+        _, context_nodeid, nodeids = message
+        # Collect (and import) in the template so that the next forks are warm
+        selected = _select(interactive, conn, context_nodeid, nodeids)
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_selected(interactive.config, selected, keep_module=False)
+            except BaseException:
+                LOGGER.exception("Forked run %s failed", os.getpid())
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        conn.send(("done",))
+
+
+def _child_process(main, interactive, conn):
+    try:
+        main(interactive, conn)
+    except BaseException:
+        LOGGER.exception("Process %s failed", os.getpid())
+    finally:
+        # Skip the atexit handlers of the parent (e.g. IPython's session shutdown)
+        os._exit(0)
+
+
+def _fork_context():
+    try:
+        return multiprocessing.get_context("fork")
+    except ValueError:
+        raise ValueError("Running tests in forked processes requires the fork start method")
+
+
+def _start_child(context, main, interactive):
+    parent_conn, child_conn = context.Pipe()
+    # HACK forking a process with threads (e.g. IPython's history) is not strictly safe
+    process = context.Process(target=_child_process, args=(main, interactive, child_conn), daemon=True)
+    process.start()
+    child_conn.close()
+    return process, parent_conn
+
+
+def _forward(config, message):
+    """Report an event received from a child process in this process."""
+    kind = message[0]
+    if kind == "logstart":
+        config.hook.pytest_runtest_logstart(nodeid=message[1], location=message[2])
+    elif kind == "report":
+        report = config.hook.pytest_report_from_serializable(config=config, data=message[1])
+        config.hook.pytest_runtest_logreport(report=report)
+    elif kind == "logfinish":
+        config.hook.pytest_runtest_logfinish(nodeid=message[1], location=message[2])
+    elif kind == "error":
+        LOGGER.error(message[1])
+
+
+def _stop_children(children):
+    for process, conn in children:
+        try:
+            conn.send(("stop",))
+        except (BrokenPipeError, OSError):
+            pass
+    for process, conn in children:
+        process.join()
+        conn.close()
+
+
+class WorkerPool:
+    """Persistent pool of worker processes forked from a warm interactive session.
+
+    The workers share the imported modules and conftests of the parent,
+    and stay alive between runs until the pool is stopped.
+    """
+
+    def __init__(self, interactive, numprocesses):
+        context = _fork_context()
+        self.interactive = interactive
+        self.numprocesses = numprocesses
+        self._workers = [_start_child(context, _worker_main, interactive) for _ in range(numprocesses)]
+
+    @property
+    def pids(self):
+        return [process.pid for process, _ in self._workers]
+
+    def is_alive(self):
+        return all(process.is_alive() for process, _ in self._workers)
+
+    def run(self, context_nodeid, items):
+        """Run the given items in the workers, reporting the results in this process."""
+        groups = _group_items(items)
+        groups.reverse()
+        idle = [conn for process, conn in self._workers if process.is_alive()]
+        # Node ids sent to each busy worker which did not finish yet
+        busy = {}
+        while groups or busy:
+            while groups and idle:
+                conn = idle.pop()
+                nodeids = [item.nodeid for item in groups.pop()]
+                conn.send(("run", context_nodeid, nodeids))
+                busy[conn] = nodeids
+            if not busy:
+                not_run = [item.nodeid for group in reversed(groups) for item in group]
+                LOGGER.error("All the workers died, tests not run: %s", ", ".join(not_run))
+                return
+            for conn in wait(list(busy)):
+                try:
+                    message = conn.recv()
+                except EOFError:
+                    LOGGER.error("A worker died, tests not run: %s", ", ".join(busy.pop(conn)))
+                    continue
+                if message[0] == "done":
+                    del busy[conn]
+                    idle.append(conn)
+                    continue
+                if message[0] == "logfinish" and message[1] in busy[conn]:
+                    busy[conn].remove(message[1])
+                _forward(self.interactive.config, message)
+
+    def stop(self):
+        """Teardown the fixtures of the workers and stop them."""
+        _stop_children(self._workers)
+        self._workers = []
+
+
+class ForkServer:
+    """Template process forked from a warm interactive session.
+
+    Every run happens in a new fork of the template, so it starts from the same
+    pristine state (imported modules, collected nodes, no fixture setup),
+    and whatever the tests change is thrown away at the end of the run.
+    """
+
+    def __init__(self, interactive):
+        self.interactive = interactive
+        self._template = _start_child(_fork_context(), _forkserver_main, interactive)
+
+    @property
+    def pid(self):
+        return self._template[0].pid
+
+    def is_alive(self):
+        return self._template[0].is_alive()
+
+    def run(self, context_nodeid, items):
+        """Run the given items in a fork of the template, reporting the results in this process."""
+        _, conn = self._template
+        conn.send(("run", context_nodeid, [item.nodeid for item in items]))
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                LOGGER.error("The fork server died, some tests were not run")
+                return
+            if message[0] == "done":
+                return
+            _forward(self.interactive.config, message)
+
+    def stop(self):
+        """Stop the template process."""
+        _stop_children([self._template])
@@ -1,5 +1,8 @@
 import pytest
+import io
 import os
+import time
+from pytest_exploratory.history import RunHistory
 from pytest_exploratory.interactive import InteractiveSession
 
 
@@ -87,6 +90,9 @@ def test_params(testdir, session):
     assert session.fixture("param") == 2
     for name in("param", "param[a]", "param[b]"):
         assert name in session.fixturenames
+    assert "param[a]" not in session.fixture_completions("par")
+    assert session.fixture_completions("param[") == ["param[a]", "param[b]"]
+    assert "paramint" in session.fixture_completions("par")
     session.context("test_params.py")
     assert session.fixture_with_name("param[a]") == ("param", 1)
     assert session.fixture("param[b]") == 2
@@ -243,13 +249,16 @@ def test_case():
     assert session.session.testsfailed == 0
     testdir.makepyfile(test_reload="""
 def test_case():
-    assert 1 == 2
+    value = 1
+    assert value == 2
     """)
     # TODO better way to detect changes
     stat = os.stat("test_reload.py")
     os.utime("test_reload.py", times=(stat.st_atime + 2, stat.st_mtime + 2))
-    session.runtests()
+    reports = [report for report in session.iter_runtests() if report.failed]
     assert session.session.testsfailed == 1
+    # The reloaded module still has its assertions rewritten
+    assert "assert 1 == 2" in str(reports[0].longrepr)
 
 def test_runtest_parse(testdir, session):
     testdir.makepyfile("""
@@ -306,3 +315,971 @@ def test_runtest_parse(testdir, session):
     session.runtests("test_2")
     assert session.session.testsfailed == 5
 
+
+def test_collection_cache(testdir, session):
+    testdir.makepyfile(test_cache="""
+class TestClass:
+    def test_case(self):
+        pass
+
+def test_other():
+    pass
+    """)
+    session.start()
+    session.session_start()
+    items = session.collect("test_cache.py")
+    assert session.collect("test_cache.py") == items
+    # Touching the file without changing it keeps the cache
+    stat = os.stat("test_cache.py")
+    os.utime("test_cache.py", times=(stat.st_atime + 2, stat.st_mtime + 2))
+    assert session.collect("test_cache.py") == items
+    testdir.makepyfile(test_cache="""
+def test_other():
+    pass
+    """)
+    os.utime("test_cache.py", times=(stat.st_atime + 4, stat.st_mtime + 4))
+    new_items = session.collect("test_cache.py")
+    assert all(item not in items for item in new_items)
+
+
+def test_collection_cache_fresh_fixtures(testdir, session):
+    testdir.makepyfile(test_fresh="""
+import pytest
+
+@pytest.fixture
+def func():
+    return []
+
+def test_a(func):
+    func.append("ran")
+    assert func == ["ran"]
+
+def test_b():
+    pass
+    """)
+    session.start()
+    session.session_start()
+    session.context("test_fresh.py::test_a")["func"].append("interactive")
+    session.context("test_fresh.py::test_b")
+    # The item of test_a is reused, with new fixtures
+    session.context("test_fresh.py")
+    session.runtests()
+    assert session.session.testsfailed == 0
+
+
+def test_node_index(testdir, session):
+    testdir.makepyfile(test_index="""
+import pytest
+
+def test_a():
+    pass
+
+@pytest.mark.parametrize("x", [1, 2])
+def test_ab(x):
+    pass
+
+class TestClass:
+    def test_a(self):
+        pass
+    """)
+    session.start()
+    session.session_start()
+    items = session.collect("test_index.py::TestClass")
+    assert [item.nodeid for item in items] == ["test_index.py::TestClass::test_a"]
+    items = session.collect("test_index.py::test_a")
+    assert [item.nodeid for item in items] == ["test_index.py::test_a"]
+    session.context("test_index.py::test_ab[2]")
+    assert session.context_item.nodeid == "test_index.py::test_ab[2]"
+
+
+def test_runtests_parallel(testdir, session):
+    testdir.makepyfile(test_parallel="""
+import pytest
+
+@pytest.fixture(scope="module")
+def module_fixture():
+    return 1
+
+def test_ok(module_fixture):
+    assert module_fixture == 1
+
+@pytest.mark.parametrize("x", [1, 2, 3])
+def test_param(x):
+    assert x != 2
+    """)
+    session.start()
+    session.session_start()
+    session.context("test_parallel.py")
+    session.runtests(["-n", "2"])
+    assert session.session.testsfailed == 1
+    pids = session._workers.pids
+    session.runtests("-n 2 test_param")
+    assert session.session.testsfailed == 2
+    assert session._workers.pids == pids
+
+
+def test_runtests_parallel_workers_die(testdir, session, caplog):
+    for name in ("a", "b", "c"):
+        testdir.tmpdir.join("dying", f"test_{name}.py").write("""
+import os
+
+def test_exit():
+    os._exit(1)
+        """, ensure=True)
+    session.start()
+    session.session_start()
+    items = session.collect("dying")
+    # Returns once every worker died
+    session._worker_pool(2).run("dying", items)
+    errors = [record.getMessage() for record in caplog.records if record.levelname == "ERROR"]
+    assert errors[-1] == "All the workers died, tests not run: dying/test_c.py::test_exit"
+
+
+def test_runtests_fork(testdir, session):
+    testdir.makepyfile(test_fork="""
+import pytest
+
+STATE = []
+
+@pytest.fixture
+def state():
+    STATE.append(1)
+    return STATE
+
+def test_pristine(state):
+    assert state == [1]
+
+def test_fail():
+    assert False
+    """)
+    session.start()
+    session.session_start()
+    session.context("test_fork.py")
+    session.runtests("--fork")
+    assert session.session.testsfailed == 1
+    pid = session._forkserver.pid
+    # Every run starts from the state of the template
+    session.runtests("--fork test_pristine")
+    session.runtests("--fork test_pristine")
+    assert session.session.testsfailed == 1
+    assert session._forkserver.pid == pid
+    with pytest.raises(SystemExit):
+        session.runtests("--fork -n 2")
+
+
+def test_reload_dependencies(testdir, session):
+    testdir.makeconftest("""
+import pytest
+
+@pytest.fixture
+def expected():
+    return 1
+    """)
+    testdir.makepyfile(helper="""
+def value():
+    return 1
+    """)
+    testdir.makepyfile(test_reload_deps="""
+from helper import value
+
+def test_case(expected):
+    assert value() == expected
+    """)
+    session.start()
+    session.session_start()
+    session.context("test_reload_deps.py")
+    session.runtests()
+    assert session.session.testsfailed == 0
+    testdir.makepyfile(helper="""
+def value():
+    return 2
+    """)
+    stat = os.stat("helper.py")
+    os.utime("helper.py", times=(stat.st_atime + 2, stat.st_mtime + 2))
+    session.runtests()
+    assert session.session.testsfailed == 1
+    testdir.makeconftest("""
+import pytest
+
+@pytest.fixture
+def expected():
+    return 2
+    """)
+    stat = os.stat("conftest.py")
+    os.utime("conftest.py", times=(stat.st_atime + 2, stat.st_mtime + 2))
+    session.runtests()
+    assert session.session.testsfailed == 1
+
+
+def test_reload_conftests_outside_packages(testdir, session):
+    def write(path, content):
+        testdir.tmpdir.join(path).write(content, ensure=True)
+        stat = os.stat(path)
+        os.utime(path, times=(stat.st_atime + 2, stat.st_mtime + 2))
+
+    write("conftest.py", """
+import pytest
+
+@pytest.fixture
+def value():
+    return "root"
+    """)
+    write("sub/conftest.py", """
+import pytest
+
+@pytest.fixture
+def other():
+    return "sub"
+    """)
+    testdir.makepyfile(test_root="""
+def test_root(value):
+    assert value == "root"
+    """)
+    write("sub/test_sub.py", """
+def test_sub(other):
+    assert other == "sub"
+    """)
+    session.start()
+    session.session_start()
+    session.context("sub/test_sub.py")
+    session.runtests()
+    assert session.session.testsfailed == 0
+    write("sub/conftest.py", """
+import pytest
+
+@pytest.fixture
+def other():
+    return "changed"
+    """)
+    session.runtests()
+    assert session.session.testsfailed == 1
+    session.context("test_root.py")
+    session.runtests()
+    assert session.session.testsfailed == 1
+    write("conftest.py", """
+import pytest
+
+@pytest.fixture
+def value():
+    return "changed"
+    """)
+    session.runtests()
+    assert session.session.testsfailed == 2
+
+
+def test_watch(testdir, session):
+    testdir.makepyfile(test_watch="""
+def test_case():
+    assert 1 == 1
+
+def test_fail():
+    assert 1 == 2
+    """)
+    session.start()
+    session.session_start()
+    session.context("test_watch.py")
+    # Nothing changed since the collection
+    session.runtests("--changed")
+    assert session.session.testsfailed == 0
+    session.watch(interval=0.05)
+    testdir.makepyfile(test_watch="""
+def test_case():
+    assert 1 == 3
+
+def test_fail():
+    assert 1 == 2
+    """)
+    stat = os.stat("test_watch.py")
+    os.utime("test_watch.py", times=(stat.st_atime + 2, stat.st_mtime + 2))
+    for _ in range(100):
+        if session.session.testsfailed:
+            break
+        time.sleep(0.05)
+    session.unwatch()
+    assert session.session.testsfailed == 2
+    with pytest.raises(SystemExit):
+        session.watch("--no-such-option")
+    assert session._watcher is None
+
+
+def test_runtests_affected(testdir, session):
+    testdir.makepyfile(helper="""
+def a():
+    return 1
+
+def b():
+    return 1
+    """)
+    testdir.makepyfile(test_affected="""
+import helper
+
+def test_a():
+    assert helper.a() == 1
+
+def test_b():
+    assert helper.b() == 1
+    """)
+    session.start()
+    session.session_start()
+    session.context("test_affected.py")
+    session.runtests("--affected")
+    assert session.session.testsfailed == 0
+    testdir.makepyfile(helper="""
+def a():
+    return 1
+
+def b():
+    return 2
+    """)
+    stat = os.stat("helper.py")
+    os.utime("helper.py", times=(stat.st_atime + 2, stat.st_mtime + 2))
+    session.runtests("--affected")
+    assert session.session.testsfailed == 1
+    # test_b was recorded with the new code and test_a is not affected
+    session.runtests("--affected")
+    assert session.session.testsfailed == 1
+    session.runtests()
+    assert session.session.testsfailed == 2
+
+
+def test_context_switch(testdir, session):
+    testdir.makepyfile(test_switch="""
+import pytest
+
+@pytest.fixture(scope="module")
+def module_fixture():
+    return object()
+
+@pytest.fixture
+def function_fixture():
+    return object()
+
+@pytest.mark.parametrize("x", [1, 2])
+def test_case(module_fixture, function_fixture, x):
+    pass
+    """)
+    session.start()
+    session.session_start()
+    first = session.context("test_switch.py::test_case[1]")
+    assert session.last_switch.rebuilt == ["function_fixture", "module_fixture"]
+    second = session.context("test_switch.py::test_case[2]")
+    assert second["module_fixture"] is first["module_fixture"]
+    assert session.last_switch.scope == "module"
+    assert session.last_switch.reused == ["module_fixture"]
+    assert session.last_switch.rebuilt == ["function_fixture"]
+
+
+def test_lazy_context(testdir, session):
+    testdir.makepyfile(test_lazy="""
+import pytest
+
+SETUP = []
+
+@pytest.fixture(autouse=True)
+def auto():
+    SETUP.append("auto")
+
+@pytest.fixture
+def expensive():
+    SETUP.append("expensive")
+    return [1, 2]
+
+def test_case(expensive):
+    pass
+    """)
+    session.start()
+    session.session_start()
+    fixtures = session.context("test_lazy.py::test_case", lazy=True)
+    setup = session.context_node.module.SETUP
+    assert setup == ["auto"]
+    namespace = dict(fixtures)
+    fixtures["expensive"]._bind(namespace)
+    assert len(fixtures["expensive"]) == 2
+    assert setup == ["auto", "expensive"]
+    assert namespace["expensive"] == [1, 2]
+    assert type(namespace["expensive"]) is list
+    session.runtests()
+    assert session.session.testsfailed == 0
+
+
+def test_concurrent_setup(testdir, session):
+    testdir.makepyfile(test_concurrent="""
+import time
+import threading
+import pytest
+
+ORDER = []
+TIMES = {}
+
+def slow(name):
+    start = time.monotonic()
+    time.sleep(0.2)
+    TIMES[name] = start, time.monotonic()
+    ORDER.append(("setup", name, threading.current_thread().name))
+
+@pytest.fixture
+def first():
+    slow("first")
+    yield
+    ORDER.append(("teardown", "first"))
+
+@pytest.fixture
+def second():
+    slow("second")
+
+@pytest.fixture
+def dependent(first):
+    slow("dependent")
+    yield
+    ORDER.append(("teardown", "dependent"))
+
+def test_case(first, second, dependent):
+    pass
+    """)
+    session.start()
+    session.session_start()
+    session.context("test_concurrent.py::test_case", setup_workers=4)
+    # The independent fixtures were setup at the same time, whatever the load of the machine
+    times = session.context_node.module.TIMES
+    assert times["first"][0] < times["second"][1] and times["second"][0] < times["first"][1]
+    order = session.context_node.module.ORDER
+    names = [name for _, name, _ in order]
+    assert names.index("first") < names.index("dependent")
+    assert all(thread.startswith("pytest-fixture") for _, _, thread in order)
+    session.runtests("--setup-workers 4")
+    assert session.session.testsfailed == 0
+    assert ("teardown", "dependent") in order
+    assert order.index(("teardown", "dependent")) < order.index(("teardown", "first"))
+
+
+def test_concurrent_setup_override(testdir, session):
+    testdir.makeconftest("""
+import pytest
+
+@pytest.fixture
+def base():
+    return 1
+
+@pytest.fixture
+def value(base):
+    return [base]
+    """)
+    testdir.makepyfile(test_override="""
+import pytest
+
+@pytest.fixture
+def value(value, other):
+    return value + [other]
+
+@pytest.fixture
+def other():
+    return 2
+
+def test_case(value):
+    assert value == [1, 2]
+    """)
+    session.start()
+    session.session_start()
+    assert session.context("test_override.py::test_case", setup_workers=2)["value"] == [1, 2]
+    session.runtests("--setup-workers 2")
+    assert session.session.testsfailed == 0
+
+
+def test_context_completions(testdir, session):
+    testdir.makepyfile(test_complete="""
+import pytest
+
+class TestClass:
+    def test_method(self):
+        pass
+
+@pytest.mark.parametrize("x", ["a", "b"])
+def test_param(x):
+    pass
+    """)
+    suite = testdir.mkpydir("suite")
+    suite.join("test_other.py").write("def test_other():\n    pass\n")
+    session.start()
+    session.session_start()
+    session.context_completions("")
+    session._completions.wait_scan()
+    assert session.context_completions("su") == ["suite/"]
+    assert session.context_completions("suite/") == ["suite/test_other.py"]
+    items = session.collect("suite")
+    writer = session.config.pluginmanager.get_plugin("terminalreporter")._tw
+    output, writer._file = writer._file, io.StringIO()
+    assert session.context_completions("test_complete.py::") == [
+        "test_complete.py::TestClass",
+        "test_complete.py::TestClass::",
+        "test_complete.py::test_param[",
+    ]
+    written, writer._file = writer._file.getvalue(), output
+    # Collected quietly, without changing the collected items of the session
+    assert written == ""
+    assert session.session.items == items
+    assert session.collect("suite") == items
+    assert session.context_completions("test_complete.py::test_param[") == [
+        "test_complete.py::test_param[a]",
+        "test_complete.py::test_param[b]",
+    ]
+
+
+def test_default_context(testdir, session):
+    testdir.makeconftest("""
+import pytest
+
+@pytest.fixture(autouse=True)
+def conf_fixture():
+    return 1
+    """)
+    fixtures = session.context()
+    assert fixtures["conf_fixture"] == 1
+    assert session.session.testscollected == 0
+    assert not os.path.exists(str(session.context_node.fspath))
+    session.context("")
+    assert session.fixture("conf_fixture") == 1
+
+
+def test_dummy_item_cache(testdir, session):
+    testdir.makeconftest("""
+def pytest_generate_tests(metafunc):
+    metafunc.config.generated = getattr(metafunc.config, "generated", 0) + 1
+    """)
+    testdir.makepyfile(test_dummy_cache="""
+import pytest
+
+@pytest.fixture(params=[1, 2], ids=["a", "b"], autouse=True)
+def param(request):
+    return object()
+
+def test_case(param):
+    pass
+    """)
+    first = session.context("test_dummy_cache.py[a]")
+    count = session.config.generated
+    session.context("test_dummy_cache.py[b]")
+    again = session.context("test_dummy_cache.py[a]")
+    assert session.config.generated == count + 1
+    # Entering a context again still gives fresh function fixtures
+    assert again["param"] is not first["param"]
+    session.fixture_param("param", "b")
+    session.context("test_dummy_cache.py[a]")
+    assert session.fixture("param") is not None
+    assert session.context_item.callspec.params["param"] == 1
+
+
+def test_profile(testdir, session, tmp_path):
+    testdir.makepyfile(test_profiled="""
+import pytest
+
+def slow_setup():
+    return sum(range(1000))
+
+def slow_call():
+    return sum(range(1000))
+
+@pytest.fixture
+def value():
+    return slow_setup()
+
+def test_case(value):
+    assert slow_call() == value
+    """)
+    session.start()
+    session.session_start()
+    session.context("test_profiled.py")
+    profiler = session.profile(session.runtests, [])
+    assert session.session.testsfailed == 0
+
+    def functions(phase):
+        return {name for _, _, name in profiler.stats(phase).stats}
+
+    assert "slow_setup" in functions("fixture setup")
+    assert "slow_setup" not in functions("call")
+    assert "slow_call" in functions("call")
+    assert profiler.stats("collection") is not None
+    filenames = profiler.dump(str(tmp_path / "profile"))
+    assert str(tmp_path / "profile.call.pstats") in filenames
+
+
+def test_fixture_times(testdir, session):
+    testdir.makepyfile(test_fixture_times="""
+import time
+import pytest
+
+@pytest.fixture(params=[1, 2], ids=["one", "two"])
+def base(request):
+    time.sleep(0.05 * request.param)
+    yield
+    time.sleep(0.05)
+
+@pytest.fixture
+def dependent(base):
+    time.sleep(0.05)
+
+def test_case(dependent):
+    pass
+    """)
+    session.start()
+    session.session_start()
+    session.context("test_fixture_times.py")
+    session.runtests([])
+    times = session.fixture_timer.times
+    assert times["base", "one"].setups == times["base", "one"].teardowns == 1
+    assert times["base", "two"].setup_wall >= 0.1
+    assert times["base", "one"].teardown_wall >= 0.05
+    assert times["dependent", None].setups == 2
+    dependent = times["dependent", None]
+    assert session.fixture_timer.cumulative(dependent) >= dependent.wall + 0.25
+    lines = session.fixture_times()
+    assert lines[0].startswith("dependent (function): cumulative")
+    assert [line.split()[0] for line in lines[1:]] == ["base[two]", "base[one]"]
+
+
+def test_runtests_repeat(testdir, session):
+    testdir.makepyfile(test_repeat="""
+import pytest
+
+SETUPS = []
+RUNS = []
+
+@pytest.fixture(scope="module")
+def module_fixture():
+    SETUPS.append(1)
+
+def test_a(module_fixture):
+    RUNS.append("a")
+
+def test_flaky(module_fixture):
+    RUNS.append("flaky")
+    assert len(RUNS) < 7
+    """)
+    session.start()
+    session.session_start()
+    session.context("test_repeat.py")
+    module = session.context_node.module
+    session.runtests("--repeat 2")
+    assert module.RUNS == ["a", "flaky"] * 2
+    assert len(module.SETUPS) == 1
+    durations = dict((row[0], row[1:]) for row in session.last_durations.summary())
+    assert durations["test_repeat.py::test_a"][0] == 2
+    session.runtests("--until-fail")
+    assert module.RUNS[4:] == ["a", "flaky"] * 2
+    assert session.session.testsfailed == 1
+    session.runtests("test_a --repeat 3 --until-fail")
+    assert module.RUNS[8:] == ["a"] * 3
+    assert len(module.SETUPS) == 1
+
+
+def test_timeit(testdir, session):
+    testdir.makepyfile(test_timeit="""
+import pytest
+
+SETUPS = []
+CALLS = []
+
+@pytest.fixture
+def value():
+    SETUPS.append(1)
+    return 42
+
+def test_case(value):
+    CALLS.append(value)
+
+def test_other():
+    pass
+    """)
+    session.start()
+    session.session_start()
+    session.context("test_timeit.py")
+    result = session.timeit("test_case", number=10, repeat=3, save_baseline=True)
+    # Timed in a temporary context
+    assert session.context_node.nodeid == "test_timeit.py"
+    assert session.contexts == []
+    module = session.context_node.module
+    assert module.CALLS == [42] * 30
+    assert len(module.SETUPS) == 1
+    assert result.nodeid == "test_timeit.py::test_case"
+    assert len(result.per_loop) == 3 and result.baseline is None
+    session.context("test_timeit.py::test_case")
+    result = session.timeit(repeat=2)
+    assert result.loops > 1
+    assert result.baseline.loops == 10
+    assert "x the baseline" in str(result)
+    with pytest.raises(KeyError):
+        session.timeit("test_missing")
+
+
+def test_history(testdir, session):
+    testdir.makepyfile(test_history="""
+import time
+import pytest
+
+DELAY = [0.0]
+
+@pytest.mark.parametrize("x", [1])
+def test_slow(x):
+    time.sleep(DELAY[0])
+
+def test_fail():
+    assert False
+    """)
+    session.start()
+    session.session_start()
+    session.context("test_history.py")
+    session.runtests([])
+    session.context_node.module.DELAY[0] = 0.1
+    session.runtests([])
+    history = session.history
+    assert history.slowest(1)[0][:2] == ("test_history.py::test_slow[1]", "passed")
+    assert [row[0] for row in history.slower(minimum=0.05)] == ["test_history.py::test_slow[1]"]
+    trend = history.trend("test_history.py::test_fail")
+    assert [row[2] for row in trend] == ["failed", "failed"]
+    assert trend[0][6] is not None
+    path = testdir.tmpdir / ".pytest_cache" / "d" / "exploratory" / "history.sqlite"
+    reopened = RunHistory(path)
+    assert reopened.trend("test_history.py::test_fail") == trend
+    reopened.close()
+
+
+def test_runtests_failed(testdir, session):
+    testdir.makepyfile(test_failed="""
+RUNS = []
+FIXED = set()
+
+def test_a():
+    RUNS.append("a")
+
+def test_b():
+    RUNS.append("b")
+    assert "b" in FIXED
+
+def test_c():
+    RUNS.append("c")
+
+def test_d():
+    RUNS.append("d")
+    assert "d" in FIXED
+    """)
+    session.start()
+    session.session_start()
+    session.context("test_failed.py")
+    module = session.context_node.module
+    session.runtests([])
+    del module.RUNS[:]
+    session.runtests("--lf")
+    assert module.RUNS == ["b", "d"]
+    del module.RUNS[:]
+    session.runtests("--ff")
+    assert module.RUNS == ["b", "d", "a", "c"]
+    assert testdir.tmpdir.join(".pytest_cache", "v", "cache", "lastfailed").check()
+    del module.RUNS[:]
+    session.runtests("--sw")
+    assert module.RUNS == ["a", "b"]
+    module.FIXED.add("b")
+    del module.RUNS[:]
+    session.runtests("--sw")
+    assert module.RUNS == ["b", "c", "d"]
+    module.FIXED.add("d")
+    del module.RUNS[:]
+    session.runtests("--sw")
+    assert module.RUNS == ["d"]
+    del module.RUNS[:]
+    session.runtests("--lf")
+    assert module.RUNS == ["a", "b", "c", "d"]
+
+
+def test_iter_runtests(testdir, session):
+    testdir.makepyfile(test_iter="""
+import pytest
+
+RUNS = []
+TEARDOWNS = []
+
+@pytest.fixture(scope="module")
+def module_fixture():
+    yield
+    TEARDOWNS.append("module")
+
+@pytest.mark.parametrize("x", range(5))
+def test_case(module_fixture, x):
+    RUNS.append(x)
+    assert x % 2 == 0
+    """)
+    session.start()
+    session.session_start()
+    session.context("test_iter.py")
+    module = session.context_node.module
+    reports = session.iter_runtests([])
+    first = [next(reports) for _ in range(3)]
+    assert [(report.nodeid, report.when) for report in first] == [
+        ("test_iter.py::test_case[0]", "setup"),
+        ("test_iter.py::test_case[0]", "call"),
+        ("test_iter.py::test_case[0]", "teardown"),
+    ]
+    assert module.RUNS == [0]
+    failures = 0
+    for report in reports:
+        failures += report.failed
+        if failures == 1:
+            break
+    reports.close()
+    assert module.RUNS == [0, 1]
+    assert module.TEARDOWNS == []
+    assert all(report.failed for report in session.iter_runtests("-k 'test_case and 3'") if report.when == "call")
+    assert module.RUNS == [0, 1, 3]
+
+
+def test_runtests_in_background(testdir, session):
+    testdir.makepyfile(test_background="""
+import time
+import threading
+import pytest
+
+STARTED = threading.Event()
+RUNS = []
+TEARDOWNS = []
+
+@pytest.fixture(autouse=True)
+def context_value():
+    return "context"
+
+@pytest.fixture
+def function_fixture(x):
+    yield x
+    TEARDOWNS.append("function")
+
+@pytest.mark.parametrize("x", range(50))
+def test_case(function_fixture, x):
+    STARTED.set()
+    RUNS.append(x)
+    time.sleep(0.05)
+    """)
+    session.start()
+    session.session_start()
+    session.context("test_background.py")
+    module = session.context_node.module
+    run = session.runtests_in_background([])
+    assert module.STARTED.wait(5)
+    with pytest.raises(RuntimeError):
+        session.runtests_in_background([])
+    # The fixtures of the context as they were before the run
+    assert session.fixture("context_value") == "context"
+    with pytest.raises(RuntimeError):
+        session.fixture("function_fixture")
+    status = session.cancel()
+    assert status.startswith("cancelled: ")
+    assert not run.is_alive()
+    assert 0 < len(module.RUNS) < 50
+    assert len(module.TEARDOWNS) == len(module.RUNS)
+    assert run.outcomes["passed"] == len(module.RUNS)
+
+
+def test_named_contexts(testdir, session):
+    testdir.makepyfile(test_named="""
+import pytest
+
+EVENTS = []
+
+@pytest.fixture(scope="module")
+def module_fixture():
+    EVENTS.append("setup module")
+    yield
+    EVENTS.append("teardown module")
+
+@pytest.fixture
+def function_fixture(module_fixture, x):
+    EVENTS.append(f"setup {x}")
+    yield x
+    EVENTS.append(f"teardown {x}")
+
+@pytest.mark.parametrize("x", ["a", "b"])
+def test_case(function_fixture, x):
+    pass
+    """, test_other="""
+def test_other():
+    pass
+    """)
+    session.start()
+    session.session_start()
+    fixtures = session.context("test_named.py::test_case[a]", name="A")
+    assert fixtures["function_fixture"] == "a"
+    module = session.context_node.module
+    fixtures = session.context("test_named.py::test_case[b]", name="B")
+    assert fixtures["function_fixture"] == "b"
+    assert session.contexts == ["A", "B"]
+    assert module.EVENTS == ["setup module", "setup a", "setup b"]
+    fixtures = session.context(name="A")
+    assert fixtures["function_fixture"] == "a"
+    assert session.fixture("function_fixture") == "a"
+    assert session.context_name == "A"
+    assert session.context(name="B")["function_fixture"] == "b"
+    assert module.EVENTS == ["setup module", "setup a", "setup b"]
+    session.runtests([])
+    assert module.EVENTS[3:] == ["teardown b"]
+    assert session.context(name="A")["function_fixture"] == "a"
+    assert session.context(name="B")["function_fixture"] == "b"
+    assert module.EVENTS[4:] == ["setup b"]
+    session.context("test_other.py::test_other")
+    assert module.EVENTS[5:] == ["teardown b", "teardown a", "teardown module"]
+    assert session.contexts == []
+
+
+def test_named_context_run_while_parked(testdir, session):
+    testdir.makepyfile(test_parked="""
+import pytest
+
+@pytest.fixture
+def func():
+    return []
+
+def test_a(func):
+    func.append("ran")
+    assert func == ["ran"]
+    """)
+    session.start()
+    session.session_start()
+    session.context("test_parked.py::test_a", name="A")["func"].append("interactive")
+    session.context("test_parked.py")
+    session.runtests()
+    assert session.session.testsfailed == 0
+    assert session.context(name="A")["func"] == ["interactive"]
+
+
+def test_restart(testdir, session):
+    testdir.makepyfile(test_restart="""
+import pytest
+
+EVENTS = []
+
+@pytest.fixture(scope="module")
+def module_fixture():
+    EVENTS.append("setup")
+    yield 1
+    EVENTS.append("teardown")
+
+def test_case(module_fixture):
+    pass
+    """)
+    session.start()
+    session.session_start()
+    assert session.context("test_restart.py::test_case")["module_fixture"] == 1
+    module = session.context_node.module
+    config, pytest_session = session.config, session.session
+    testdir.makepyfile(test_restart="""
+import pytest
+
+@pytest.fixture(scope="module")
+def module_fixture():
+    return 2
+
+def test_case(module_fixture):
+    pass
+    """)
+    session.restart()
+    assert module.EVENTS == ["setup", "teardown"]
+    assert session.config is config and session.session is not pytest_session
+    assert session.context_item is None
+    assert session.context("test_restart.py::test_case")["module_fixture"] == 2
+    session.runtests([])
+    assert session.session.testsfailed == 0